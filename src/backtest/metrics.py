@@ -3,42 +3,56 @@ import pandas as pd
 from pandas import DataFrame
 
 
-def compute_equity_metrics(equity_df: DataFrame) -> dict:
-    df = equity_df.copy()
-    df.sort_index(inplace=True)
-    df = df.dropna(subset=["equity"])
-    if len(df) >= 2:
-        eq = df["equity"]
-
-        initial_equity = eq.iloc[0]
-        final_equity = eq.iloc[-1]
+def compute_equity_arrays(
+    equity_df: DataFrame,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, pd.DatetimeIndex]:
+    """
+    Sorted, NaN-free equity values with their high-water mark, drawdown and
+    time index: (eq, hwm, dd, index). Shared by the metrics and the report.
+    """
+    # sort_index/dropna return new frames; the caller's frame is untouched
+    df = equity_df.sort_index().dropna(subset=["equity"])
+    eq_arr = df["equity"].to_numpy()
+    hwm = np.maximum.accumulate(eq_arr)
+    dd = eq_arr / hwm - 1.0
+    return eq_arr, hwm, dd, df.index
+
+
+def compute_equity_metrics(
+    equity_df: DataFrame,
+    equity_arrays: tuple | None = None,
+) -> dict:
+    """
+    `equity_arrays` is the output of compute_equity_arrays(equity_df); it is
+    computed here when not supplied.
+    """
+    if equity_arrays is None:
+        equity_arrays = compute_equity_arrays(equity_df)
+    eq_arr, hwm, dd, _ = equity_arrays
+
+    if len(eq_arr) >= 2:
+        initial_equity = eq_arr[0]
+        final_equity = eq_arr[-1]
 
         if initial_equity > 0:
             total_return_pct = final_equity / initial_equity - 1
         else:
             raise RuntimeError("INITIAL EQUITY SHOULD BE POSITIVE")
 
-        hwm = eq.cummax()
-        dd = eq / hwm - 1
-
         max_drawdown_pct = dd.min()
 
-        underwater = eq < hwm
-
-        duration = 0
-        max_drawdown_duration_bars = duration
-        for val in underwater:
-            if not val:
-                max_drawdown_duration_bars = max(max_drawdown_duration_bars, duration)
-                duration = 0
-            else:
-                duration += 1
-        max_drawdown_duration_bars = max(max_drawdown_duration_bars, duration)
-        ret = eq.pct_change()
+        underwater = (eq_arr < hwm).astype(np.int8)
+
+        # Run-length encode the underwater flags: edges of the padded array
+        # alternate between streak starts and streak ends.
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], underwater, [0]))))
+        runs = edges[1::2] - edges[::2]
+        max_drawdown_duration_bars = int(runs.max()) if runs.size else 0
+        ret = eq_arr[1:] / eq_arr[:-1] - 1.0
         mean_return = ret.mean()
-        std_return = ret.std()
+        std_return = ret.std(ddof=1)
 
-        return {
+        metrics = {
             "initial_equity": initial_equity,
             "final_equity": final_equity,
             "total_return_pct": total_return_pct,
@@ -46,8 +60,9 @@ def compute_equity_metrics(equity_df: DataFrame) -> dict:
             "max_drawdown_duration_bars": max_drawdown_duration_bars,
             "mean_bar_return": mean_return,
             "std_bar_return": std_return,
-            "number_of_bars": len(eq),
+            "number_of_bars": len(eq_arr),
         }
+        return metrics
     else:
         raise RuntimeError("EQUITY ERROR: need at least 2 non-NaN equity points")
 
@@ -56,32 +71,31 @@ def compute_trade_metrics(trades_df: DataFrame) -> dict:
     if trades_df is None or len(trades_df) == 0:
         raise RuntimeError("TRADE METRICS ERROR: no trades to analyze")
 
-    df = trades_df.copy()
+    df = trades_df  # read-only below, no copy needed
     num_trades = len(df)
 
-    wins = df["pnl_usd"] > 0
-    losses = df["pnl_usd"] < 0
+    # One pass of masks over the raw pnl / R arrays (no pandas re-slicing)
+    pnl = df["pnl_usd"].to_numpy(dtype=np.float64)
+    wins = pnl > 0
+    losses = pnl < 0
 
     num_wins = int(wins.sum())
     num_losses = int(losses.sum())
     win_rate = num_wins / num_trades
 
-    r = df["r_multiple"]
-    expectancy_r = r.mean()
-
-    profits_series = df.loc[wins, "pnl_usd"]
-    losses_series = df.loc[losses, "pnl_usd"]
+    r = df["r_multiple"].to_numpy(dtype=np.float64)
+    expectancy_r = np.nanmean(r)
 
-    profits = float(profits_series.sum()) if len(profits_series) else 0.0
-    abs_losses = float((-losses_series).sum()) if len(losses_series) else 0.0
+    profits = float(pnl[wins].sum())
+    abs_losses = float(-pnl[losses].sum())
 
     if abs_losses == 0.0:
         profit_factor = np.inf if profits > 0 else np.nan
     else:
         profit_factor = profits / abs_losses
 
-    avg_win = float(profits_series.mean()) if len(profits_series) else np.nan
-    avg_loss = float(losses_series.mean()) if len(losses_series) else np.nan
+    avg_win = profits / num_wins if num_wins else np.nan
+    avg_loss = -abs_losses / num_losses if num_losses else np.nan
     avg_win_loss = (avg_win / abs(avg_loss)) if np.isfinite(avg_win) and np.isfinite(avg_loss) and avg_loss != 0 else np.nan
 
     # bars held (4H bars)
@@ -99,10 +113,10 @@ def compute_trade_metrics(trades_df: DataFrame) -> dict:
         "win_rate": win_rate,
 
         "expectancy_r": expectancy_r,
-        "median_r_multiple": r.median(),
-        "max_r_multiple": r.max(),
-        "min_r_multiple": r.min(),
-        "std_r_multiple": r.std(),
+        "median_r_multiple": np.nanmedian(r),
+        "max_r_multiple": np.nanmax(r),
+        "min_r_multiple": np.nanmin(r),
+        "std_r_multiple": np.nanstd(r, ddof=1),
 
         "profit_factor": profit_factor,
         "avg_win": avg_win,
@@ -2,34 +2,138 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
+import matplotlib
+
+matplotlib.use("Agg")  # headless: reports are only ever written to files
 import matplotlib.pyplot as plt
 import json
 
+from src.backtest.metrics import compute_equity_arrays
+from src.core.utils import HAS_PYARROW
+
 
-def _clean(obj):
-    """Convert numpy scalars to python scalars for JSON."""
-    if isinstance(obj, dict):
-        return {k: _clean(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple)):
-        return [_clean(x) for x in obj]
+def _np_default(obj):
+    """json.dump fallback: only called for values JSON can't encode natively."""
     if isinstance(obj, np.generic):
         return obj.item()
-    return obj
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _group_mean(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """NaN-skipping per-group mean of `values` via bincount."""
+    ok = ~np.isnan(values)
+    sums = np.bincount(codes, weights=np.where(ok, values, 0.0), minlength=n_groups)
+    counts = np.bincount(codes, weights=ok, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def _pnl_by_group(t: DataFrame, key: str) -> DataFrame:
+    """
+    Trade count, total/avg/median PnL and mean R per value of `key`
+    (NaN keys form their own group), using factorize + bincount.
+    """
+    codes, uniques = pd.factorize(t[key], sort=True, use_na_sentinel=False)
+    n_groups = len(uniques)
+    pnl = t["pnl_usd"].to_numpy(dtype=np.float64)
+    pnl_ok = ~np.isnan(pnl)
+
+    num_trades = np.bincount(codes, minlength=n_groups)
+    total_pnl = np.bincount(
+        codes, weights=np.where(pnl_ok, pnl, 0.0), minlength=n_groups
+    )
+    avg_pnl = _group_mean(codes, pnl, n_groups)
+
+    # Medians: sort once by group code and split into contiguous runs
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(1, n_groups))
+    median_pnl = np.array(
+        [
+            np.median(chunk[~np.isnan(chunk)]) if (~np.isnan(chunk)).any() else np.nan
+            for chunk in np.split(pnl[order], bounds)
+        ]
+    )
 
+    if "r_multiple" in t.columns:
+        mean_r = _group_mean(
+            codes, t["r_multiple"].to_numpy(dtype=np.float64), n_groups
+        )
+    else:
+        mean_r = avg_pnl
+
+    return pd.DataFrame(
+        {
+            "num_trades": num_trades,
+            "total_pnl": total_pnl,
+            "avg_pnl": avg_pnl,
+            "median_pnl": median_pnl,
+            "mean_r": mean_r,
+        },
+        index=pd.Index(uniques, name=key),
+    )
+
+
+def _save_plot(fig, path: Path, draw, *, title: str, xlabel: str, ylabel: str) -> None:
+    """Clear the shared report figure, draw one chart on it and save it."""
+    fig.clear()
+    ax = fig.add_subplot(111)
+    draw(ax)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def _write_frame(frame: DataFrame, path: Path, *, index: bool = True) -> None:
+    """Write `frame` as parquet (zstd) or CSV, picked from the path suffix."""
+    if path.suffix == ".parquet":
+        frame.to_parquet(path, engine="pyarrow", compression="zstd", index=index)
+    else:
+        frame.to_csv(path, index=index)
+
+
+def save_backtest_outputs(
+    result: dict,
+    out_dir: Path,
+    k_stop: float,
+    *,
+    fmt: str = "parquet",
+    include_execution: bool = True,
+) -> None:
+    """
+    Write the result frames and JSON summaries for one k_stop.
 
-def save_backtest_outputs(result: dict, out_dir: Path, k_stop: float) -> None:
+    fmt="parquet" (zstd, via pyarrow) is the default; fmt="csv" keeps the
+    old text outputs, and CSV is also used when pyarrow is not installed.
+    include_execution=False skips the (large) execution_df dump.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
 
+    if fmt not in ("parquet", "csv"):
+        raise RuntimeError(
+            f"OUTPUT ERROR: unsupported format '{fmt}'. Use 'parquet' or 'csv'."
+        )
+    if fmt == "parquet" and not HAS_PYARROW:
+        fmt = "csv"
+
     # DataFrames
-    result["trades_df"].to_csv(out_dir / f"trades_k={str(k_stop)}.csv", index=False)
-    result["equity_df"].to_csv(out_dir / f"equity_k={str(k_stop)}.csv")
-    result["execution_df"].to_csv(out_dir / f"execution_df_k={str(k_stop)}.csv")
+    _write_frame(
+        result["trades_df"], out_dir / f"trades_k={str(k_stop)}.{fmt}", index=False
+    )
+    _write_frame(result["equity_df"], out_dir / f"equity_k={str(k_stop)}.{fmt}")
+    if include_execution:
+        _write_frame(
+            result["execution_df"], out_dir / f"execution_df_k={str(k_stop)}.{fmt}"
+        )
 
     for name in ["trade_metrics", "equity_metrics", "counts", "config"]:
         with (out_dir / f"{name}_k={str(k_stop)}.json").open(
             "w", encoding="utf-8"
         ) as f:
-            json.dump(_clean(result.get(name, {})), f, indent=2)
+            json.dump(result.get(name, {}), f, indent=2, default=_np_default)
 
 
 def build_report_pack(
@@ -47,34 +151,34 @@ def build_report_pack(
     if execution_df is None or execution_df.empty:
         raise RuntimeError("REPORT ERROR: execution_df missing/empty")
 
-    # Equity + Drawdown plots
-    eq = equity_df.copy()
-    eq.sort_index(inplace=True)
-    eq = eq.dropna(subset=["equity"])
-    equity_series = eq["equity"]
+    # Equity + Drawdown plots (reuse the arrays computed for the metrics)
+    equity_arrays = result.get("_eq")
+    if equity_arrays is None:
+        equity_arrays = compute_equity_arrays(equity_df)
+    eq_arr, _, dd, eq_index = equity_arrays
+
+    # One figure is reused for every chart in the pack
+    fig = plt.figure()
 
     # Equity plot
-    plt.figure()
-    plt.plot(equity_series.index, equity_series.values)
-    plt.title("Equity Curve")
-    plt.xlabel("Time")
-    plt.ylabel("Equity")
-    plt.tight_layout()
-    plt.savefig(out_dir / f"equity_curve_k={str(k_stop)}.png")
-    plt.close()
+    _save_plot(
+        fig,
+        out_dir / f"equity_curve_k={str(k_stop)}.png",
+        lambda ax: ax.plot(eq_index, eq_arr),
+        title="Equity Curve",
+        xlabel="Time",
+        ylabel="Equity",
+    )
 
     # Drawdown plot
-    hwm = equity_series.cummax()
-    dd = equity_series / hwm - 1.0
-
-    plt.figure()
-    plt.plot(dd.index, dd.values)
-    plt.title("Drawdown")
-    plt.xlabel("Time")
-    plt.ylabel("Drawdown (fraction)")
-    plt.tight_layout()
-    plt.savefig(out_dir / f"drawdown_k={str(k_stop)}.png")
-    plt.close()
+    _save_plot(
+        fig,
+        out_dir / f"drawdown_k={str(k_stop)}.png",
+        lambda ax: ax.plot(eq_index, dd),
+        title="Drawdown",
+        xlabel="Time",
+        ylabel="Drawdown (fraction)",
+    )
 
     # Trade Info
 
@@ -88,9 +192,22 @@ def build_report_pack(
             "w", encoding="utf-8"
         ) as f:
             json.dump({"note": "No trades"}, f, indent=2)
+        plt.close(fig)
         return
 
-    t = trades_df.copy()
+    t = trades_df  # only read; columns are added via assign (a new frame)
+
+    # Parse trade timestamps once; reused by the hold-time and regime blocks
+    entry_dt = (
+        pd.to_datetime(t["entry_time"], utc=True, errors="coerce")
+        if "entry_time" in t.columns
+        else None
+    )
+    exit_dt = (
+        pd.to_datetime(t["exit_time"], utc=True, errors="coerce")
+        if "exit_time" in t.columns
+        else None
+    )
     if "reason" in t.columns:
         reason_counts = t["reason"].value_counts(dropna=False).to_dict()
     else:
@@ -99,23 +216,11 @@ def build_report_pack(
     with (out_dir / f"exit_reason_counts_k={str(k_stop)}.json").open(
         "w", encoding="utf-8"
     ) as f:
-        json.dump(_clean(reason_counts), f, indent=2)
+        json.dump(reason_counts, f, indent=2, default=_np_default)
 
     if "reason" in t.columns and "pnl_usd" in t.columns:
-        pnl_by_reason = (
-            t.groupby("reason", dropna=False)
-            .agg(
-                num_trades=("pnl_usd", "size"),
-                total_pnl=("pnl_usd", "sum"),
-                avg_pnl=("pnl_usd", "mean"),
-                median_pnl=("pnl_usd", "median"),
-                mean_r=(
-                    ("r_multiple", "mean")
-                    if "r_multiple" in t.columns
-                    else ("pnl_usd", "mean")
-                ),
-            )
-            .sort_values("total_pnl", ascending=True)
+        pnl_by_reason = _pnl_by_group(t, "reason").sort_values(
+            "total_pnl", ascending=True
         )
         pnl_by_reason.to_csv(out_dir / f"pnl_by_reason_k={str(k_stop)}.csv")
     else:
@@ -127,10 +232,6 @@ def build_report_pack(
 
     hold_stats = {}
     if "entry_time" in t.columns and "exit_time" in t.columns:
-        entry = pd.to_datetime(t["entry_time"], utc=True, errors="coerce")
-        exit_ = pd.to_datetime(t["exit_time"], utc=True, errors="coerce")
-        hold_td = exit_ - entry
-
         tf = str(timeframe).lower().strip()
         if tf == "4h":
             bar_size = pd.Timedelta(hours=4)
@@ -139,14 +240,18 @@ def build_report_pack(
         else:
             bar_size = pd.Timedelta(hours=4)
 
-        bars_held = (hold_td / bar_size).astype(float)
+        # Integer nanosecond arithmetic; NaT (unparseable times) -> NaN
+        entry_ns = pd.DatetimeIndex(entry_dt).as_unit("ns").asi8
+        exit_ns = pd.DatetimeIndex(exit_dt).as_unit("ns").asi8
+        valid = entry_dt.notna().to_numpy() & exit_dt.notna().to_numpy()
+        bars_held = np.where(valid, (exit_ns - entry_ns) / bar_size.value, np.nan)
 
         hold_stats["avg_bars_held"] = float(np.nanmean(bars_held))
         hold_stats["median_bars_held"] = float(np.nanmedian(bars_held))
         hold_stats["max_bars_held"] = float(np.nanmax(bars_held))
 
         if "pnl_usd" in t.columns:
-            wins = t["pnl_usd"] > 0
+            wins = t["pnl_usd"].to_numpy() > 0
             hold_stats["avg_bars_winners"] = (
                 float(np.nanmean(bars_held[wins])) if wins.any() else np.nan
             )
@@ -156,39 +261,39 @@ def build_report_pack(
     with (out_dir / f"hold_time_stats_k={str(k_stop)}.json").open(
         "w", encoding="utf-8"
     ) as f:
-        json.dump(_clean(hold_stats), f, indent=2)
+        json.dump(hold_stats, f, indent=2, default=_np_default)
 
     # Histograms
     if "pnl_usd" in t.columns:
-        plt.figure()
-        plt.hist(t["pnl_usd"].dropna().values, bins=40)
-        plt.title("PnL Histogram")
-        plt.xlabel("PnL (USD)")
-        plt.ylabel("Count")
-        plt.tight_layout()
-        plt.savefig(out_dir / f"pnl_hist_k={str(k_stop)}.png")
-        plt.close()
+        _save_plot(
+            fig,
+            out_dir / f"pnl_hist_k={str(k_stop)}.png",
+            lambda ax: ax.hist(t["pnl_usd"].dropna().values, bins=40),
+            title="PnL Histogram",
+            xlabel="PnL (USD)",
+            ylabel="Count",
+        )
 
     if "r_multiple" in t.columns:
-        plt.figure()
-        plt.hist(t["r_multiple"].dropna().values, bins=40)
-        plt.title("R-Multiple Histogram")
-        plt.xlabel("R")
-        plt.ylabel("Count")
-        plt.tight_layout()
-        plt.savefig(out_dir / f"r_multiple_hist_k={str(k_stop)}.png")
-        plt.close()
+        _save_plot(
+            fig,
+            out_dir / f"r_multiple_hist_k={str(k_stop)}.png",
+            lambda ax: ax.hist(t["r_multiple"].dropna().values, bins=40),
+            title="R-Multiple Histogram",
+            xlabel="R",
+            ylabel="Count",
+        )
+    plt.close(fig)
 
     if "vol_regime" in execution_df.columns and "entry_time" in t.columns:
         ex = execution_df.sort_index()
 
-        entry_ts = pd.to_datetime(t["entry_time"], utc=True, errors="coerce")
-        regimes = ex["vol_regime"].reindex(entry_ts, method="ffill")
-        t["entry_vol_regime"] = regimes.values
+        regimes = ex["vol_regime"].reindex(entry_dt, method="ffill")
+        t = t.assign(entry_vol_regime=regimes.values)
 
         if "pnl_usd" in t.columns:
             pnl_by_regime = (
-                t.groupby("entry_vol_regime", dropna=False)
+                t.groupby("entry_vol_regime", observed=True, dropna=False)
                 .agg(
                     num_trades=("pnl_usd", "size"),
                     total_pnl=("pnl_usd", "sum"),
@@ -2,12 +2,53 @@ import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
-
+from src.core.utils import njit
+
+# Columns consumed by run_simulation, in kernel argument order, with the
+# dtype each is handed to the kernel as
+SIMULATION_COLUMNS = {
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "entry_long": bool,
+    "entry_price": np.float64,
+    "stop_price": np.float64,
+    "risk_per_unit": np.float64,
+    "can_trade": bool,
+    "risk_multiplier": np.float64,
+    "ema_fast_4h": np.float64,
+    "vol_regime": object,
+}
+
+# Exit reason codes written by the simulation kernel
+EXIT_REASONS = np.array(["STOP", "PERMISSION", "TIME"], dtype=object)
+EXIT_STOP = 0
+EXIT_PERMISSION = 1
+EXIT_TIME = 2
+
+# Column layout of the trade record buffer filled by the simulation kernel
+_T_ENTRY_IDX = 0
+_T_EXIT_IDX = 1
+_T_ENTRY_PRICE = 2
+_T_EXIT_PRICE = 3
+_T_UNITS = 4
+_T_REMAINING_UNITS = 5
+_T_REASON = 6
+_T_PNL = 7
+_T_PARTIAL_TAKEN = 8
+_T_R_MULTIPLE = 9
+_T_CASH_AFTER = 10
+_N_TRADE_FIELDS = 11
+_INITIAL_TRADE_CAPACITY = 64
+
+
+@njit(cache=True)
 def apply_buy_cost(price: float, cost_rate: float) -> float:
     filled_price = price * (1 + cost_rate)
     return filled_price
 
 
+@njit(cache=True)
 def apply_sell_cost(price: float, cost_rate: float) -> float:
     filled_price = price * (1 - cost_rate)
     return filled_price
@@ -101,33 +142,140 @@ def run_simulation(
         Time-indexed equity curve reflecting mark-to-market equity
         across the entire backtest.
     """
-    df_4h = df.copy()
-    df_4h.sort_index(inplace=True)
-
-    required_columns = {
-        "high",
-        "low",
-        "close",
-        "entry_long",
-        "entry_price",
-        "stop_price",
-        "risk_per_unit",
-        "can_trade",
-        "risk_multiplier",
-        "ema_fast_4h",
-        "vol_regime",
-    }
-    missing = required_columns - set(df_4h.columns)
+    missing = set(SIMULATION_COLUMNS) - set(df.columns)
     if missing:
         raise RuntimeError(f"INCORRECT DATAFRAME: missing columns {missing}")
 
-    cash: float = float(initial_cash)
-    equity: float = float(initial_cash)
+    # Only the simulator's columns are selected (and sorted), not the full frame
+    df_4h = df[list(SIMULATION_COLUMNS)].sort_index()
+
+    # Extract each column once as a contiguous numpy array for the kernel
+    (
+        high,
+        low,
+        close,
+        entry_long,
+        entry_price,
+        stop_price,
+        rpu,
+        can_trade,
+        rm,
+        ema_fast,
+        vol_regime,
+    ) = (
+        df_4h[col].to_numpy(dtype=dtype) for col, dtype in SIMULATION_COLUMNS.items()
+    )
+    is_high_vol = vol_regime == "HIGH_VOL"
+
+    # Finiteness is checked once per column here rather than per bar in the
+    # kernel. A non-finite risk multiplier counts as 0 (no entry).
+    close_ok = np.isfinite(close)
+    low_ok = np.isfinite(low)
+    high_ok = np.isfinite(high)
+    ema_ok = np.isfinite(ema_fast)
+    rm = np.where(np.isfinite(rm), rm, 0.0)
+    entry_ok = np.isfinite(entry_price) & np.isfinite(rpu) & (rpu > 0) & (rm > 0)
+
+    # For every bar, the first bar at or after it where a PERMISSION exit can
+    # fire (n if none), so the kernel can jump over quiet bars while holding
+    n = len(df_4h)
+    permission_exit_bars = np.flatnonzero(~can_trade & close_ok)
+    next_permission_exit = np.append(permission_exit_bars, n)[
+        np.searchsorted(permission_exit_bars, np.arange(n))
+    ]
+
+    equity, trade_records = _simulate_core(
+        high,
+        low,
+        close,
+        entry_long,
+        entry_price,
+        stop_price,
+        rpu,
+        can_trade,
+        rm,
+        ema_fast,
+        is_high_vol,
+        close_ok,
+        low_ok,
+        high_ok,
+        ema_ok,
+        entry_ok,
+        next_permission_exit,
+        float(initial_cash),
+        float(risk_pct),
+        float(cost_rate),
+        int(max_hold_bars),
+    )
+
+    index = df_4h.index
+    trades_df = pd.DataFrame(
+        {
+            "entry_time": index[trade_records[:, _T_ENTRY_IDX].astype(np.int64)],
+            "exit_time": index[trade_records[:, _T_EXIT_IDX].astype(np.int64)],
+            "entry_price": trade_records[:, _T_ENTRY_PRICE],
+            "exit_price": trade_records[:, _T_EXIT_PRICE],
+            "units": trade_records[:, _T_UNITS],
+            "remaining_units": trade_records[:, _T_REMAINING_UNITS],
+            "reason": EXIT_REASONS[trade_records[:, _T_REASON].astype(np.int64)],
+            "pnl_usd": trade_records[:, _T_PNL],
+            "partial_taken": trade_records[:, _T_PARTIAL_TAKEN].astype(bool),
+            "r_multiple": trade_records[:, _T_R_MULTIPLE],
+            "cash_after": trade_records[:, _T_CASH_AFTER],
+        }
+    )
+    equity_df = pd.DataFrame(
+        {"equity": equity}, index=pd.Index(index, name="timestamp")
+    )
+    return trades_df, equity_df
+
+
+@njit(cache=True)
+def _simulate_core(
+    high,
+    low,
+    close,
+    entry_long,
+    entry_price,
+    stop_price,
+    rpu,
+    can_trade,
+    rm,
+    ema_fast,
+    is_high_vol,
+    close_ok,
+    low_ok,
+    high_ok,
+    ema_ok,
+    entry_ok,
+    next_permission_exit,
+    initial_cash,
+    risk_pct,
+    cost_rate,
+    max_hold_bars,
+):
+    """
+    Bar-by-bar state machine behind `run_simulation`, over plain numpy arrays.
+
+    Returns the per-bar equity array and a (n_trades, _N_TRADE_FIELDS)
+    float64 array of completed trades, laid out by the _T_* column indices.
+    """
+    n = close.shape[0]
+    equity_arr = np.empty(n, dtype=np.float64)
+
+    # Trade records live in one buffer that doubles in size when full
+    trade_records = np.empty(
+        (_INITIAL_TRADE_CAPACITY, _N_TRADE_FIELDS), dtype=np.float64
+    )
+    n_trades = 0
+
+    cash = initial_cash
+    equity = initial_cash
 
     # position state
     in_position = False
     units = 0.0
-    entry_time = None
+    entry_idx = -1
     entry_price_filled = np.nan
     stop_price_state = np.nan
     risk_per_unit_state = np.nan
@@ -138,67 +286,50 @@ def run_simulation(
     tp1_price = np.nan
     tp1_fraction = 0.5
     realized_pnl_usd = 0.0
-    regime = ""
-
-    trades: list[dict] = []
-    equity_records: list[dict] = []
-
-    for ts, row in df_4h.iterrows():
-        close = float(row["close"]) if np.isfinite(row["close"]) else np.nan
-        low = float(row["low"]) if np.isfinite(row["low"]) else np.nan
-        high = float(row["high"]) if np.isfinite(row["high"]) else np.nan
+    high_vol_entry = False
+    skip_until = 0
+
+    for i in range(n):
+        if i < skip_until:
+            continue  # quiet bar already marked to market by the jump below
+        close_i = close[i]
+        low_i = low[i]
+        high_i = high[i]
         if not in_position:
             # Flat: equity equals cash (no open position)
             equity = cash
 
-            if bool(row["entry_long"]):
-                regime = row["vol_regime"]
+            if entry_long[i]:
+                high_vol_entry = is_high_vol[i]
                 partial_taken = False
                 realized_pnl_usd = 0.0
-                raw_entry = (
-                    float(row["entry_price"])
-                    if np.isfinite(row["entry_price"])
-                    else np.nan
-                )
-                rpu = (
-                    float(row["risk_per_unit"])
-                    if np.isfinite(row["risk_per_unit"])
-                    else np.nan
-                )
-                rm = (
-                    float(row["risk_multiplier"])
-                    if np.isfinite(row["risk_multiplier"])
-                    else 0.0
-                )
+                raw_entry = entry_price[i]
+                rpu_i = rpu[i]
+                rm_i = rm[i]
 
                 # Basic validity checks
-                if (
-                    (not np.isfinite(raw_entry))
-                    or (not np.isfinite(rpu))
-                    or (rpu <= 0)
-                    or (rm <= 0)
-                ):
-                    equity_records.append({"timestamp": ts, "equity": equity})
+                if not entry_ok[i]:
+                    equity_arr[i] = equity
                     continue
 
                 filled_entry = apply_buy_cost(raw_entry, cost_rate)
 
                 if (not np.isfinite(filled_entry)) or (filled_entry <= 0):
-                    equity_records.append({"timestamp": ts, "equity": equity})
+                    equity_arr[i] = equity
                     continue
 
                 # Risk budget (equity-based) adjusted by volatility regime multiplier
-                risk_budget = equity * float(risk_pct)
-                adj_risk_budget = risk_budget * rm
+                risk_budget = equity * risk_pct
+                adj_risk_budget = risk_budget * rm_i
 
                 # Units sized by risk, capped by available cash (spot-only)
-                units_by_risk = adj_risk_budget / rpu
+                units_by_risk = adj_risk_budget / rpu_i
                 units_by_cash = cash / filled_entry
                 final_units = min(units_by_risk, units_by_cash)
 
                 # Skip if cannot buy anything meaningful
                 if (not np.isfinite(final_units)) or (final_units <= 0):
-                    equity_records.append({"timestamp": ts, "equity": equity})
+                    equity_arr[i] = equity
                     continue
 
                 # Apply entry (cash decreases by notional)
@@ -207,37 +338,51 @@ def run_simulation(
                 # Set position state
                 in_position = True
 
-                units = float(final_units)
+                units = final_units
                 remaining_units = units
-                entry_time = ts
-                entry_price_filled = float(filled_entry)
-                stop_price_state = (
-                    float(row["stop_price"])
-                    if np.isfinite(row["stop_price"])
-                    else np.nan
-                )
-                risk_per_unit_state = float(rpu)
-                tp1_price = (
-                    float(raw_entry) + 1.0 * risk_per_unit_state
-                    if np.isfinite(raw_entry) and np.isfinite(risk_per_unit_state)
-                    else np.nan
-                )
+                entry_idx = i
+                entry_price_filled = filled_entry
+                stop_price_state = stop_price[i]
+                risk_per_unit_state = rpu_i
+                tp1_price = raw_entry + 1.0 * risk_per_unit_state
                 bars_held = 0
 
         else:
+            if not partial_taken:
+                # Before TP1 the stop is fixed, so the next bar that can change
+                # state is the first stop/TP1 touch, permission flip or time
+                # stop. Bars before it only need marking to market.
+                hold_limit = max_hold_bars if high_vol_entry else 10
+                horizon = min(
+                    next_permission_exit[i], i + max(hold_limit - bars_held, 0), n
+                )
+                touched = np.flatnonzero(
+                    (low[i:horizon] <= stop_price_state)
+                    | (high[i:horizon] >= tp1_price)
+                )
+                event = i + touched[0] if touched.size else horizon
+                if event > i:
+                    quiet_close = close[i:event]
+                    equity_arr[i:event] = np.where(
+                        close_ok[i:event],
+                        cash + remaining_units * quiet_close,
+                        cash,
+                    )
+                    bars_held += event - i
+                    skip_until = event
+                    continue
+
             # In position: default mark-to-market equity
-            if np.isfinite(close):
-                equity = cash + remaining_units * close
+            if close_ok[i]:
+                equity = cash + remaining_units * close_i
             else:
                 equity = (
                     cash  # fallback if close is bad (shouldn't happen after validation)
                 )
 
-            ema_now = (
-                float(row["ema_fast_4h"]) if np.isfinite(row["ema_fast_4h"]) else np.nan
-            )
+            ema_now = ema_fast[i]
 
-            if partial_taken and np.isfinite(ema_now):
+            if partial_taken and ema_ok[i]:
                 stop_price_state = (
                     ema_now
                     if not np.isfinite(stop_price_state)
@@ -246,32 +391,32 @@ def run_simulation(
 
             # Exit checks (priority order)
             exit_trade = False
-            exit_reason = None
+            exit_reason = -1
             raw_exit = np.nan
 
             # 1) STOP (intrabar)
             if (
-                np.isfinite(low)
+                low_ok[i]
                 and np.isfinite(stop_price_state)
-                and (low <= stop_price_state)
+                and (low_i <= stop_price_state)
             ):
                 raw_exit = stop_price_state
-                exit_reason = "STOP"
+                exit_reason = EXIT_STOP
                 exit_trade = True
 
             # 2) TP Price Hit
             elif (
-                np.isfinite(high)
+                high_ok[i]
                 and np.isfinite(tp1_price)
-                and high >= tp1_price
-                and partial_taken == False
+                and high_i >= tp1_price
+                and not partial_taken
             ):
                 raw_tp1_exit = tp1_price
                 filled_tp1_exit = apply_sell_cost(raw_tp1_exit, cost_rate)
                 units_sold = remaining_units * tp1_fraction
                 remaining_units -= units_sold
                 cash += units_sold * filled_tp1_exit
-                if np.isfinite(ema_now):
+                if ema_ok[i]:
                     stop_price_state = (
                         ema_now
                         if not np.isfinite(stop_price_state)
@@ -284,21 +429,21 @@ def run_simulation(
                     equity = cash + remaining_units * filled_tp1_exit
 
             # 3) PERMISSION flip (close)
-            elif (not bool(row["can_trade"])) and np.isfinite(close):
-                raw_exit = close
-                exit_reason = "PERMISSION"
+            elif (not can_trade[i]) and close_ok[i]:
+                raw_exit = close_i
+                exit_reason = EXIT_PERMISSION
                 exit_trade = True
 
             # 4) TIME stop (close)
             elif (
-                bars_held >= (int(max_hold_bars) if regime == "HIGH_VOL" else 10)
-            ) and np.isfinite(close):
-                raw_exit = close
-                exit_reason = "TIME"
+                bars_held >= (max_hold_bars if high_vol_entry else 10)
+            ) and close_ok[i]:
+                raw_exit = close_i
+                exit_reason = EXIT_TIME
                 exit_trade = True
 
             if exit_trade:
-                filled_exit = apply_sell_cost(float(raw_exit), cost_rate)
+                filled_exit = apply_sell_cost(raw_exit, cost_rate)
 
                 final_pnl_usd = remaining_units * (filled_exit - entry_price_filled)
                 total_pnl = realized_pnl_usd + final_pnl_usd
@@ -310,28 +455,31 @@ def run_simulation(
                     total_pnl / denom if (np.isfinite(denom) and denom > 0) else np.nan
                 )
 
-                trades.append(
-                    {
-                        "entry_time": entry_time,
-                        "exit_time": ts,
-                        "entry_price": entry_price_filled,
-                        "exit_price": float(filled_exit),
-                        "units": units,
-                        "remaining_units": remaining_units,
-                        "reason": exit_reason,
-                        "pnl_usd": float(total_pnl),
-                        "partial_taken": partial_taken,
-                        "r_multiple": (
-                            float(r_multiple) if np.isfinite(r_multiple) else np.nan
-                        ),
-                        "cash_after": float(cash),
-                    }
-                )
+                if n_trades == trade_records.shape[0]:
+                    grown = np.empty(
+                        (2 * trade_records.shape[0], _N_TRADE_FIELDS), dtype=np.float64
+                    )
+                    grown[:n_trades] = trade_records
+                    trade_records = grown
+
+                record = trade_records[n_trades]
+                record[_T_ENTRY_IDX] = entry_idx
+                record[_T_EXIT_IDX] = i
+                record[_T_ENTRY_PRICE] = entry_price_filled
+                record[_T_EXIT_PRICE] = filled_exit
+                record[_T_UNITS] = units
+                record[_T_REMAINING_UNITS] = remaining_units
+                record[_T_REASON] = exit_reason
+                record[_T_PNL] = total_pnl
+                record[_T_PARTIAL_TAKEN] = 1.0 if partial_taken else 0.0
+                record[_T_R_MULTIPLE] = r_multiple
+                record[_T_CASH_AFTER] = cash
+                n_trades += 1
 
                 # Reset position state
                 in_position = False
                 units = 0.0
-                entry_time = None
+                entry_idx = -1
                 entry_price_filled = np.nan
                 stop_price_state = np.nan
                 risk_per_unit_state = np.nan
@@ -348,8 +496,6 @@ def run_simulation(
                 # Still holding
                 bars_held += 1
 
-        equity_records.append({"timestamp": ts, "equity": float(equity)})
+        equity_arr[i] = equity
 
-    trades_df = pd.DataFrame(trades)
-    equity_df = pd.DataFrame(equity_records).set_index("timestamp")
-    return trades_df, equity_df
+    return equity_arr, trade_records[:n_trades]
@@ -0,0 +1,26 @@
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:  # numba is optional; kernels then run as plain Python
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit (supports bare and called forms)."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+try:
+    import pyarrow  # noqa: F401
+
+    HAS_PYARROW = True
+except ImportError:  # parquet I/O needs pyarrow; callers fall back to CSV
+    HAS_PYARROW = False
+
+
+def ensure_sorted(df):
+    """Return df sorted by index, skipping the sort when already monotonic."""
+    return df if df.index.is_monotonic_increasing else df.sort_index()
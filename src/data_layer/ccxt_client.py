@@ -1,77 +1,97 @@
 import ccxt
+import time
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from validators import validate_ohlcv
 from storage import load_ohlcv, upsert_ohlcv
 
 
+# One client per exchange for the whole process; markets are refreshed
+# only once they are older than MARKETS_TTL_SECONDS.
+MARKETS_TTL_SECONDS = 3600
+_CLIENTS: dict[str, ccxt.Exchange] = {}
+_MARKETS_LOADED_AT: dict[str, float] = {}
+
+
 def get_exchange_client(exchange: str) -> ccxt.Exchange:
     if not hasattr(ccxt, exchange):
         raise ValueError(f"Unsupported exchange '{exchange}' in ccxt.")
-    client_class = getattr(ccxt, exchange)
-    client = client_class(
-        {
-            "enableRateLimit": True,
-            "options": {"adjustForTimeDifference": True},
-        }
-    )
 
-    client.load_markets()
+    client = _CLIENTS.get(exchange)
+    if client is None:
+        client_class = getattr(ccxt, exchange)
+        client = client_class(
+            {
+                "enableRateLimit": True,
+                "options": {"adjustForTimeDifference": True},
+            }
+        )
+        _CLIENTS[exchange] = client
+
+    now = time.monotonic()
+    loaded_at = _MARKETS_LOADED_AT.get(exchange)
+    if loaded_at is None or now - loaded_at > MARKETS_TTL_SECONDS:
+        client.load_markets(reload=loaded_at is not None)
+        _MARKETS_LOADED_AT[exchange] = now
     return client
 
 
 def fetch_ohlcv_chunk(
     client: ccxt.Exchange, symbol: str, timeframe: str, start_ms: int, limit: int
-) -> DataFrame:
+) -> list[list]:
+    """Raw [timestamp_ms, open, high, low, close, volume] rows for one request."""
     ohlcv = client.fetch_ohlcv(symbol, timeframe, start_ms, limit)
-
-    if not ohlcv:
-        return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
-
-    df = pd.DataFrame(
-        ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"]
-    )
-
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    df.set_index("timestamp", inplace=True)
-    df.sort_index(inplace=True)
-
-    try:
-        df = validate_ohlcv(df, timeframe)
-    except RuntimeError as e:
-        raise RuntimeError(f"DATA FETCH ERROR: {e}")
-
-    return df
+    return ohlcv or []
 
 
 def fetch_ohlcv_range(
     client, symbol: str, timeframe: str, start_ms: int, end_ms: int, limit: int
 ) -> DataFrame:
-    since = start_ms
-    chunks: list[DataFrame] = []
-
-    while since < end_ms:
+    # Each request covers `limit` bars, so every chunk's start time is known
+    # up front. Requests stay sequential: the sync client's rate limiter is
+    # not thread-safe, and concurrent calls could burst past the exchange limit.
+    tf_ms = int(client.parse_timeframe(timeframe) * 1000)
+
+    # end_ms is inclusive throughout: a bar opening exactly at end_ms is kept
+    all_rows: list[list] = []
+    for since in range(start_ms, end_ms + 1, limit * tf_ms):
         chunk = fetch_ohlcv_chunk(client, symbol, timeframe, since, limit)
-        if chunk.empty:
-            break
-
-        end_ts = pd.to_datetime(end_ms, unit="ms", utc=True)
-        chunk = chunk.loc[chunk.index <= end_ts]
-        if chunk.empty:
-            break
+        all_rows.extend(chunk)
+
+        # A chunk shorter than `limit` that stops before its window ends was
+        # capped by the exchange: page on from its last bar to fill the gap.
+        window_last = min(since + limit * tf_ms - 1, end_ms)
+        while chunk and len(chunk) < limit and chunk[-1][0] + tf_ms <= window_last:
+            chunk = fetch_ohlcv_chunk(
+                client, symbol, timeframe, int(chunk[-1][0]) + tf_ms, limit
+            )
+            chunk = [row for row in chunk if row[0] <= window_last]
+            all_rows.extend(chunk)
 
-        chunks.append(chunk)
-        last_ms = int(chunk.index[-1].timestamp() * 1000)
-        since = last_ms + 1
+    if not all_rows:
+        return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
 
-    if not chunks:
+    # Parse and validate all chunks in a single pass
+    arr = np.asarray(all_rows, dtype=np.float64)
+    arr = arr[arr[:, 0] <= end_ms]
+    if len(arr) == 0:
         return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
 
-    df = pd.concat(chunks)
+    df = pd.DataFrame(
+        arr[:, 1:],
+        columns=["open", "high", "low", "close", "volume"],
+        index=pd.to_datetime(arr[:, 0].astype("int64"), unit="ms", utc=True),
+    )
+    df.index.name = "timestamp"
     df = df[~df.index.duplicated(keep="last")]
     df.sort_index(inplace=True)
-    df = validate_ohlcv(df, timeframe)
+
+    try:
+        df = validate_ohlcv(df, timeframe)
+    except RuntimeError as e:
+        raise RuntimeError(f"DATA FETCH ERROR: {e}")
     return df
 
 
@@ -1,8 +1,20 @@
+import functools
 import os
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
+from src.core.utils import HAS_PYARROW
 from src.data_layer.validators import validate_ohlcv
 
+if HAS_PYARROW:
+    import pyarrow as pa
+    from pyarrow import feather
+
+OHLCV_DTYPES = {col: np.float64 for col in ("open", "high", "low", "close", "volume")}
+# Columns narrowed by load_ohlcv(downcast=True), an opt-in for memory-bound
+# callers. Prices stay float64: float32 puts ~5e-6 relative error on the ATR.
+DOWNCAST_DTYPES = {"volume": np.float32}
+
 
 def symbol_to_path_component(symbol: str) -> str:
     """Convert CCXT symbol (e.g. BTC/USD) to filesystem-safe name (BTC-USD)."""
@@ -10,31 +22,87 @@ def symbol_to_path_component(symbol: str) -> str:
     return symbol
 
 
-def get_ohlcv_path(exchange: str, symbol: str, timeframe: str, root_dir: str) -> str:
-    """Return canonical path to OHLCV CSV for given exchange/symbol/timeframe."""
+def get_ohlcv_path(
+    exchange: str, symbol: str, timeframe: str, root_dir: str, ext: str = "parquet"
+) -> str:
+    """Return path to the OHLCV file (parquet by default, or legacy CSV)."""
     symbol = symbol_to_path_component(symbol)
-    path = os.path.join(root_dir, exchange, symbol, timeframe, "ohlcv.csv")
+    path = os.path.join(root_dir, exchange, symbol, timeframe, f"ohlcv.{ext}")
     return path
 
 
 def load_ohlcv(
-    exchange: str, symbol: str, timeframe: str, root_dir: str
+    exchange: str,
+    symbol: str,
+    timeframe: str,
+    root_dir: str,
+    *,
+    downcast: bool = False,
 ) -> DataFrame | None:
+    # Prefer the columnar parquet file; fall back to legacy CSV
     path = get_ohlcv_path(exchange, symbol, timeframe, root_dir)
-    if not os.path.exists(path):
-        return None
-
-    df = pd.read_csv(path)
-    if "timestamp" not in df.columns:
-        raise RuntimeError(f"LOAD ERROR: Missing 'timestamp' column in {path}")
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df.set_index("timestamp", inplace=True)
+    if not (HAS_PYARROW and os.path.exists(path)):
+        path = get_ohlcv_path(exchange, symbol, timeframe, root_dir, ext="csv")
+        if not os.path.exists(path):
+            return None
+
+    st = os.stat(path)
+    df = _load_validated_ohlcv(path, timeframe, st.st_mtime_ns, st.st_size)
+    if downcast:
+        return df.astype(DOWNCAST_DTYPES)
+    # The cached frame is shared between calls; hand out a (CoW) shallow copy
+    return df.copy(deep=False)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_validated_ohlcv(
+    path: str, timeframe: str, mtime_ns: int, size: int
+) -> DataFrame:
+    # mtime_ns/size are part of the cache key so rewriting the file invalidates it
+    cache_path = path + ".feather"
+    source_stamp = {b"source_mtime_ns": b"%d" % mtime_ns, b"source_size": b"%d" % size}
+    if HAS_PYARROW and os.path.exists(cache_path):
+        table = feather.read_table(cache_path)
+        # Reused only for the exact source it was built from: a source swapped
+        # for an older file (cp -p, rsync -a, git checkout) must not match
+        metadata = table.schema.metadata or {}
+        if all(metadata.get(key) == value for key, value in source_stamp.items()):
+            # Snapshot is written only after validation, so validators are skipped
+            return table.to_pandas()
+
+    if path.endswith(".parquet"):
+        # Typed columns and the UTC DatetimeIndex are stored natively
+        df = pd.read_parquet(path, engine="pyarrow")
+    else:
+        # mmap'd read with a fixed schema: no dtype sniffing
+        try:
+            df = pd.read_csv(
+                path, memory_map=True, dtype=OHLCV_DTYPES, index_col="timestamp"
+            )
+        except ValueError as e:
+            if "timestamp" in str(e):
+                raise RuntimeError(f"LOAD ERROR: Missing 'timestamp' column in {path}")
+            raise
+        # save_ohlcv writes epoch nanoseconds; older files hold ISO strings
+        if pd.api.types.is_integer_dtype(df.index):
+            ts = pd.to_datetime(df.index, unit="ns", utc=True)
+        else:
+            ts = pd.to_datetime(df.index, format="ISO8601", utc=True)
+        df.index = ts.rename("timestamp")
     df.sort_index(inplace=True)
 
     try:
         df = validate_ohlcv(df, timeframe)
     except RuntimeError as e:
         raise RuntimeError(f"{e} while loading OHLCV")
+
+    if HAS_PYARROW:
+        try:
+            table = pa.Table.from_pandas(df.rename_axis("timestamp"))
+            metadata = {**(table.schema.metadata or {}), **source_stamp}
+            feather.write_feather(table.replace_schema_metadata(metadata), cache_path)
+        except OSError:
+            pass  # the snapshot is only a speed-up
     return df
 
 
@@ -42,46 +110,56 @@ def save_ohlcv(
     df: DataFrame, exchange: str, symbol: str, timeframe: str, root_dir: str
 ) -> None:
     required_columns = ["open", "high", "low", "close", "volume"]
-    path = get_ohlcv_path(exchange, symbol, timeframe, root_dir)
     try:
         df = validate_ohlcv(df, timeframe)
     except RuntimeError as e:
         raise RuntimeError(f"SAVE_OHLCV ERROR: {e}")
+
+    if HAS_PYARROW:
+        path = get_ohlcv_path(exchange, symbol, timeframe, root_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        out = df[required_columns].rename_axis("timestamp")
+        out.to_parquet(path, engine="pyarrow", compression="zstd")
+        # The parquet file now supersedes any legacy CSV and its snapshot;
+        # left behind, they would be read again wherever pyarrow is missing
+        legacy = get_ohlcv_path(exchange, symbol, timeframe, root_dir, ext="csv")
+        for stale in (legacy, legacy + ".feather"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        return
+
+    path = get_ohlcv_path(exchange, symbol, timeframe, root_dir, ext="csv")
     os.makedirs(os.path.dirname(path), exist_ok=True)
     out = df[required_columns].copy()
-    out.insert(
-        0, "timestamp", df.index.astype(str)
-    )  # UTC-aware index -> ISO-like strings
+    out.insert(0, "timestamp", df.index.as_unit("ns").asi8)  # epoch nanoseconds
     out.to_csv(path, index=False)
 
 
 def merge_ohlcv(
     old_df: DataFrame | None, new_df: DataFrame, timeframe: str
 ) -> DataFrame:
-    try:
-        validate_ohlcv(new_df, timeframe)
-    except RuntimeError as e:
-        raise RuntimeError(f"MERGE OHLCV ERROR: {e}")
     if old_df is None:
-        return new_df
-    else:
-        try:
-            validate_ohlcv(old_df, timeframe)
-        except RuntimeError as e:
-            raise RuntimeError(f"MERGE OHLCV ERROR: {e}")
-        merged = pd.concat([old_df, new_df])
-        merged = merged[~merged.index.duplicated(keep="last")]
-        merged.sort_index(inplace=True)
         try:
-            validate_ohlcv(merged, timeframe)
+            validate_ohlcv(new_df, timeframe)
         except RuntimeError as e:
             raise RuntimeError(f"MERGE OHLCV ERROR: {e}")
-        return merged
+        return new_df
+
+    # New rows override old ones; the halves are disjoint, so no dedup pass.
+    # Only the merged result is validated, which also covers both inputs.
+    keep_old = ~old_df.index.isin(new_df.index)
+    merged = pd.concat([old_df.loc[keep_old], new_df]).sort_index()
+    try:
+        validate_ohlcv(merged, timeframe)
+    except RuntimeError as e:
+        raise RuntimeError(f"MERGE OHLCV ERROR: {e}")
+    return merged
 
 
 def upsert_ohlcv(
     new_df: DataFrame, exchange: str, symbol: str, timeframe: str, root_dir: str
 ) -> DataFrame:
+    # Full precision, so rewriting the file never loses volume digits
     old_df = load_ohlcv(exchange, symbol, timeframe, root_dir)
     merged = merge_ohlcv(old_df, new_df, timeframe)
     save_ohlcv(merged, exchange, symbol, timeframe, root_dir)
@@ -39,22 +39,24 @@ def schema_validator(df):
 # no duplicates
 # strictly increasing
 def timestamp_validator(df):
-    df = df.copy()
     if not isinstance(df.index, pd.DatetimeIndex):
         raise RuntimeError(
             "INDEX ERROR: DataFrame index must be a pandas DatetimeIndex."
         )
 
+    # Returns the input itself when already UTC; set_axis shares column data
     if df.index.tz is None:
-        df.index = df.index.tz_localize("UTC")
+        df = df.set_axis(df.index.tz_localize("UTC"), axis=0)
     elif str(df.index.tz) != "UTC":
-        df.index = df.index.tz_convert("UTC")
-
-    if df.index.has_duplicates:
-        dup_ts = df.index[df.index.duplicated()].unique()[:5]
-        raise RuntimeError(f"DUPLICATE ERROR: Found duplicate timestamps, {dup_ts}")
-
-    if not df.index.is_monotonic_increasing:
+        df = df.set_axis(df.index.tz_convert("UTC"), axis=0)
+
+    # Strictly positive steps prove both uniqueness and order in one scan;
+    # the duplicate diagnostics are only computed on failure
+    diffs = np.diff(df.index.asi8)
+    if df.index.hasnans or (diffs.size and diffs.min() <= 0):
+        if df.index.has_duplicates:
+            dup_ts = df.index[df.index.duplicated()].unique()[:5]
+            raise RuntimeError(f"DUPLICATE ERROR: Found duplicate timestamps, {dup_ts}")
         raise RuntimeError(
             "CHRONOLOGY ERROR: Timestamps are not in strictly increasing order. Try df.sort_index()."
         )
@@ -62,17 +64,20 @@ def timestamp_validator(df):
 
 
 def candle_integrity_validator(df):
-    cond1 = df["high"] >= df["low"]
-
-    cond2 = (df["open"] <= df["high"]) & (df["open"] >= df["low"])
-    cond3 = (df["close"] <= df["high"]) & (df["close"] >= df["low"])
-    cond4 = df["volume"] >= 0
-    cond5 = (
-        (df["open"] >= 0) & (df["high"] >= 0) & (df["low"] >= 0) & (df["close"] >= 0)
+    arr = df[["open", "high", "low", "close", "volume"]].to_numpy()
+    o, h, l, c, v = arr.T
+
+    # One mask over the (N, 5) block; the min over OHLC replaces four >= 0 checks
+    is_valid = (
+        (h >= l)
+        & (o <= h)
+        & (o >= l)
+        & (c <= h)
+        & (c >= l)
+        & (v >= 0)
+        & (arr[:, :4].min(axis=1) >= 0)
     )
 
-    is_valid = cond1 & cond2 & cond3 & cond4 & cond5
-
     if not is_valid.all():
         invalid_count = (~is_valid).sum()
         first_bad = df.index[~is_valid][0]
@@ -100,11 +105,12 @@ def timeframe_sanity_validator(df, timeframe):
         tol = pd.Timedelta(minutes=5)
         min_match_ratio = 0.8
 
-        deltas = df.index.to_series().diff().iloc[1:]
-        matches = (deltas - expected_tf).abs() <= tol
-        if len(matches) > 0:
-            average_score = matches.mean()
-            match_ratio = float(average_score)
+        # asi8 counts ticks of the index's own unit (ns, or us under pandas 3)
+        tick = pd.Timedelta(1, unit=df.index.unit).value
+        deltas = np.diff(df.index.asi8)
+        if deltas.size > 0:
+            matches = np.abs(deltas - expected_tf.value // tick) <= tol.value // tick
+            match_ratio = float(matches.mean())
         else:
             match_ratio = 1.0
         if match_ratio < min_match_ratio:
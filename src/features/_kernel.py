@@ -0,0 +1,370 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.core.utils import HAS_NUMBA, njit, prange
+
+# Regime codes written by compute_all; -1 marks bars without a percentile
+REGIME_NONE = -1
+REGIME_LOW_VOL = 0
+REGIME_TRADE_OK = 1
+REGIME_HIGH_VOL = 2
+
+
+def ewm_alpha(span: float) -> float:
+    # Same smoothing factor pandas derives for ewm(span=...)
+    return 1.0 / (1.0 + (span - 1) / 2.0)
+
+
+@njit(cache=True)
+def ewm_update(w, old_wt, cur, alpha):
+    """
+    One pandas ewm(adjust=False, ignore_na=False) step, rounded as pandas does.
+    Takes and returns the (w, old_wt) state: a NaN bar only decays old_wt, and
+    a NaN w seeds from the first finite bar. Every EMA kernel goes through it.
+    """
+    if w == w:
+        old_wt *= 1.0 - alpha
+        if cur == cur:
+            if w != cur:
+                w = (old_wt * w + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+    elif cur == cur:
+        w = cur
+    return w, old_wt
+
+
+@njit(cache=True)
+def ema_step(prev, x, alpha, old_wt=1.0):
+    """
+    Extend an ewm(adjust=False) series by one bar x. Start from old_wt=1.0 and
+    pass the returned old_wt back with the next bar; it only differs from 1.0
+    after NaN bars. Returns the new (ema, old_wt).
+    """
+    return ewm_update(prev, old_wt, x, alpha)
+
+
+@njit(cache=True)
+def ema_extend(x, prev, old_wt, alpha):
+    """
+    Continue an ewm(adjust=False) series over new bars from its (prev, old_wt)
+    state; a NaN prev seeds from the first finite bar. Returns the values and
+    the old_wt to resume from, so NaN gaps across batches weigh as in pandas.
+    """
+    out = np.empty_like(x)
+    w = prev
+    for i in range(x.shape[0]):
+        w, old_wt = ewm_update(w, old_wt, x[i], alpha)
+        out[i] = w
+    return out, old_wt
+
+
+def ewm_old_wt(x: np.ndarray, alpha: float) -> float:
+    """The old_wt pandas' ewm(adjust=False) holds after the last bar of x."""
+    finite = np.flatnonzero(~np.isnan(x))
+    old_wt = 1.0
+    if finite.size:
+        # Only the NaN bars after the last observation decay it
+        for _ in range(x.shape[0] - 1 - finite[-1]):
+            old_wt *= 1.0 - alpha
+    return old_wt
+
+
+def ema_adjust_false(x: np.ndarray, span: float) -> np.ndarray:
+    """Series.ewm(span=span, adjust=False).mean() on a float64 array."""
+    if not HAS_NUMBA:
+        # An uncompiled Python loop would be far slower than pandas' Cython path
+        return pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+    return _ema_adjust_false(x, ewm_alpha(span))
+
+
+@njit(cache=True)
+def _ema_adjust_false(x, alpha):
+    out = np.empty_like(x)
+    w = np.nan
+    old_wt = 1.0
+    for i in range(x.shape[0]):
+        w, old_wt = ewm_update(w, old_wt, x[i], alpha)
+        out[i] = w
+    return out
+
+
+def ema_adjust_false_dual(
+    x: np.ndarray, fast_span: float, slow_span: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """ema_adjust_false for two spans in one pass over x."""
+    if not HAS_NUMBA:
+        return ema_adjust_false(x, fast_span), ema_adjust_false(x, slow_span)
+    return _ema_adjust_false_dual(x, ewm_alpha(fast_span), ewm_alpha(slow_span))
+
+
+@njit(cache=True)
+def _ema_adjust_false_dual(x, fast_alpha, slow_alpha):
+    fast = np.empty_like(x)
+    slow = np.empty_like(x)
+    fast_w = slow_w = np.nan
+    fast_old_wt = slow_old_wt = 1.0
+    for i in range(x.shape[0]):
+        fast_w, fast_old_wt = ewm_update(fast_w, fast_old_wt, x[i], fast_alpha)
+        slow_w, slow_old_wt = ewm_update(slow_w, slow_old_wt, x[i], slow_alpha)
+        fast[i] = fast_w
+        slow[i] = slow_w
+    return fast, slow
+
+
+@njit(cache=True)
+def compute_signals(
+    open_, low, close, atr, can_trade, ema_fast_alpha, ema_slow_alpha, k_stop
+):
+    """
+    Trend-pullback stages in one pass: both EMAs (pandas ewm(adjust=False)
+    rounding), the 4H trend / pullback / bullish flags, entries and the
+    initial stop and risk per unit.
+    """
+    n = close.shape[0]
+    ema_fast = np.full(n, np.nan)
+    ema_slow = np.full(n, np.nan)
+    trend_4h_ok = np.zeros(n, dtype=np.bool_)
+    pullback = np.zeros(n, dtype=np.bool_)
+    bullish = np.zeros(n, dtype=np.bool_)
+    entry_long = np.zeros(n, dtype=np.bool_)
+    entry_price = np.full(n, np.nan)
+    stop_price = np.full(n, np.nan)
+    risk_per_unit = np.full(n, np.nan)
+
+    fast_w = np.nan
+    slow_w = np.nan
+    fast_old_wt = 1.0
+    slow_old_wt = 1.0
+
+    for i in range(n):
+        # EMAs (pandas ewm, adjust=False, ignore_na=False)
+        cur = close[i]
+        fast_w, fast_old_wt = ewm_update(fast_w, fast_old_wt, cur, ema_fast_alpha)
+        slow_w, slow_old_wt = ewm_update(slow_w, slow_old_wt, cur, ema_slow_alpha)
+        ema_fast[i] = fast_w
+        ema_slow[i] = slow_w
+
+        # Signals, entry and initial stop
+        trend_4h_ok[i] = fast_w > slow_w
+        pullback[i] = low[i] <= fast_w and cur > fast_w
+        bullish[i] = cur > open_[i]
+        if can_trade[i] and trend_4h_ok[i] and pullback[i] and bullish[i]:
+            entry_long[i] = True
+            entry_price[i] = cur
+            stop_price[i] = cur - k_stop * atr[i]
+            risk_per_unit[i] = cur - stop_price[i]
+
+    return (
+        ema_fast, ema_slow, trend_4h_ok, pullback, bullish,
+        entry_long, entry_price, stop_price, risk_per_unit,
+    )  # fmt: skip
+
+
+@njit(parallel=True, cache=True)
+def compute_signals_2d(
+    open_, low, close, atr, can_trade, ema_fast_alpha, ema_slow_alpha, k_stop
+):
+    """
+    compute_signals down each column of (T, S) blocks, one symbol per column,
+    with the symbols spread across threads. Returns the same 9 outputs as
+    (T, S) blocks.
+    """
+    shape = close.shape
+    ema_fast = np.empty(shape)
+    ema_slow = np.empty(shape)
+    trend_4h_ok = np.empty(shape, dtype=np.bool_)
+    pullback = np.empty(shape, dtype=np.bool_)
+    bullish = np.empty(shape, dtype=np.bool_)
+    entry_long = np.empty(shape, dtype=np.bool_)
+    entry_price = np.empty(shape)
+    stop_price = np.empty(shape)
+    risk_per_unit = np.empty(shape)
+    for s in prange(shape[1]):
+        out = compute_signals(
+            open_[:, s], low[:, s], close[:, s], atr[:, s], can_trade[:, s],
+            ema_fast_alpha, ema_slow_alpha, k_stop,
+        )  # fmt: skip
+        ema_fast[:, s] = out[0]
+        ema_slow[:, s] = out[1]
+        trend_4h_ok[:, s] = out[2]
+        pullback[:, s] = out[3]
+        bullish[:, s] = out[4]
+        entry_long[:, s] = out[5]
+        entry_price[:, s] = out[6]
+        stop_price[:, s] = out[7]
+        risk_per_unit[:, s] = out[8]
+    return (
+        ema_fast, ema_slow, trend_4h_ok, pullback, bullish,
+        entry_long, entry_price, stop_price, risk_per_unit,
+    )  # fmt: skip
+
+
+@njit(cache=True)
+def rolling_pct_rank_fenwick(x, window):
+    """
+    Share of the last `window` values <= the current one (NaN while the
+    window is short or holds a NaN), as volatility.rolling_pct_rank. Values
+    are replaced by dense ranks and counted in a Fenwick tree, so each bar
+    costs O(log N) instead of a rescan of the window.
+    """
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    levels = np.unique(x[~np.isnan(x)])
+    rank = np.searchsorted(levels, x) + 1  # 1-based; only used for finite x
+    tree = np.zeros(levels.shape[0] + 1, dtype=np.int64)
+
+    nan_in_window = 0
+    for i in range(n):
+        if x[i] != x[i]:
+            nan_in_window += 1
+        else:
+            j = rank[i]
+            while j < tree.shape[0]:
+                tree[j] += 1
+                j += j & -j
+        if i >= window:
+            old = x[i - window]
+            if old != old:
+                nan_in_window -= 1
+            else:
+                j = rank[i - window]
+                while j < tree.shape[0]:
+                    tree[j] -= 1
+                    j += j & -j
+        if i >= window - 1 and nan_in_window == 0:
+            cnt = 0
+            j = rank[i]
+            while j > 0:
+                cnt += tree[j]
+                j -= j & -j
+            out[i] = cnt / window
+    return out
+
+
+@njit(cache=True)
+def compute_all(
+    open_,
+    high,
+    low,
+    close,
+    trend_ok,
+    ema_fast_alpha,
+    ema_slow_alpha,
+    atr_window,
+    pct_window,
+    low_thr,
+    high_thr,
+    k_stop,
+    can_enter_lut,
+    risk_lut,
+):
+    """
+    Every numeric feature column of the execution frame from the 4H arrays:
+    one pass for ATR, the Fenwick percentile rank, one pass for regime and
+    permissions, then compute_signals for the strategy columns. The EMA and
+    rolling-mean recurrences follow pandas' ewm(adjust=False) and
+    rolling().mean() step for step, so results match the staged feature
+    functions bit for bit (pinned by tests/test_pipeline.py).
+    """
+    n = close.shape[0]
+    atr = np.full(n, np.nan)
+    norm_atr = np.full(n, np.nan)
+    regime = np.full(n, REGIME_NONE, dtype=np.int8)
+    can_enter = np.zeros(n, dtype=np.bool_)
+    risk_multiplier = np.zeros(n)
+    can_trade = np.zeros(n, dtype=np.bool_)
+
+    tr = np.full(n, np.nan)  # tr[0] stays NaN: no previous close
+
+    # Rolling-mean state (compensated online sum, as in pandas)
+    sum_x = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    nobs = 0
+    neg_ct = 0
+    same_ct = 0
+    prev_value = np.nan
+
+    for i in range(n):
+        # True range and ATR
+        if i > 0:
+            pc = close[i - 1]
+            a = high[i] - low[i]
+            b = abs(high[i] - pc)
+            c = abs(low[i] - pc)
+            if a != a or b != b or c != c:
+                tr[i] = np.nan
+            else:
+                tr[i] = max(a, b, c)
+
+        if i >= atr_window:
+            val = tr[i - atr_window]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0:
+                    neg_ct -= 1
+        val = tr[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if math.copysign(1.0, val) < 0:
+                neg_ct += 1
+            if val == prev_value:
+                same_ct += 1
+            else:
+                same_ct = 1
+            prev_value = val
+        if nobs >= atr_window and nobs > 0:
+            m = sum_x / nobs
+            if same_ct >= nobs:
+                m = prev_value
+            elif neg_ct == 0 and m < 0:
+                m = 0.0
+            elif neg_ct == nobs and m > 0:
+                m = 0.0
+            atr[i] = m
+        norm_atr[i] = atr[i] / close[i]
+
+    vol_pct = rolling_pct_rank_fenwick(norm_atr, pct_window)
+    for i in range(n):
+        p = vol_pct[i]
+        if p == p:
+            if p < low_thr:
+                code = REGIME_LOW_VOL
+            elif p < high_thr:
+                code = REGIME_TRADE_OK
+            else:
+                code = REGIME_HIGH_VOL
+            regime[i] = code
+            can_enter[i] = can_enter_lut[code]
+            risk_multiplier[i] = risk_lut[code]
+        can_trade[i] = can_enter[i] and trend_ok[i]
+
+    (
+        ema_fast,
+        ema_slow,
+        trend_4h_ok,
+        pullback,
+        bullish,
+        entry_long,
+        entry_price,
+        stop_price,
+        risk_per_unit,
+    ) = compute_signals(
+        open_, low, close, atr, can_trade, ema_fast_alpha, ema_slow_alpha, k_stop
+    )
+
+    return (
+        atr, norm_atr, vol_pct, regime, can_enter, risk_multiplier,
+        can_trade, ema_fast, ema_slow, trend_4h_ok, pullback, bullish,
+        entry_long, entry_price, stop_price, risk_per_unit,
+    )  # fmt: skip
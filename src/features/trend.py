@@ -2,12 +2,17 @@ import pandas as pd
 pd.set_option('future.no_silent_downcasting', True)
 from pandas import DataFrame
 import numpy as np
+from src.core.utils import ensure_sorted
+from src.features._kernel import ema_adjust_false
+
+# Feature functions never mutate their input: new columns are added with
+# assign(), which returns a new frame sharing the untouched column data.
+
 
 def add_daily_ema_bias(df_1d: DataFrame, ema_span: int = 200) -> DataFrame:
-    out = df_1d.copy()
-    out["ema200"] = out["close"].ewm(span=ema_span, adjust=False).mean()
-    out["long_bias_1d"] = out["close"] > out["ema200"]
-    return out
+    close = df_1d["close"].to_numpy(dtype=np.float64)
+    ema200 = ema_adjust_false(close, ema_span)
+    return df_1d.assign(ema200=ema200, long_bias_1d=close > ema200)
 
 
 def add_trend_ok_to_execution(df_4h: DataFrame, df_1d: DataFrame) -> DataFrame:
@@ -19,20 +24,22 @@ def add_trend_ok_to_execution(df_4h: DataFrame, df_1d: DataFrame) -> DataFrame:
       - Shift by 1 day so that day D uses bias from day D-1 (daily candle must be closed).
       - For each 4H timestamp, use the most recent available shifted daily bias at or before that time.
     """
-    out_4h = df_4h.copy()
-
-    out_4h.sort_index(inplace=True)
-    d1 = df_1d.sort_index()
+    out_4h = ensure_sorted(df_4h)
+    d1 = ensure_sorted(df_1d)
 
     if "long_bias_1d" not in d1.columns:
         raise RuntimeError("TREND ERROR: df_1d_bias must contain 'long_bias_1d'.")
 
-    bias_prev = d1["long_bias_1d"].shift(1)
+    long_bias = d1["long_bias_1d"].to_numpy(dtype=bool)
 
-    trend_ok = bias_prev.reindex(out_4h.index, method="ffill")
+    # Daily row before the last one at or before each 4H bar (the shift by one
+    # day); bars without such a prior day get False rather than NaN
+    pos = d1.index.searchsorted(out_4h.index, side="right") - 2
+    trend_ok = np.zeros(len(out_4h), dtype=bool)
+    has_day = pos >= 0
+    trend_ok[has_day] = long_bias[pos[has_day]]
 
-    out_4h["trend_ok"] = trend_ok
-    return out_4h
+    return out_4h.assign(trend_ok=trend_ok)
 
 
 def add_can_trade(df_4h: DataFrame) -> DataFrame:
@@ -41,14 +48,15 @@ def add_can_trade(df_4h: DataFrame) -> DataFrame:
       - can_enter (from volatility)
       - trend_ok
     """
-    out = df_4h.copy()
-    if "can_enter" not in out.columns:
+    if "can_enter" not in df_4h.columns:
         raise RuntimeError("PERMISSION ERROR: Missing 'can_enter'.")
-    if "trend_ok" not in out.columns:
+    if "trend_ok" not in df_4h.columns:
         raise RuntimeError("PERMISSION ERROR: Missing 'trend_ok'.")
 
-    out["can_trade"] = out["can_enter"].fillna(False) & out["trend_ok"].fillna(False)
-    return out
+    # Both flags are plain bool columns, so no NaN filling is needed
+    can_enter = df_4h["can_enter"].to_numpy(dtype=bool)
+    trend_ok = df_4h["trend_ok"].to_numpy(dtype=bool)
+    return df_4h.assign(can_trade=can_enter & trend_ok)
 
 ################### Checks ########################
 # from src.data_layer.storage import load_ohlcv
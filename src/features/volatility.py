@@ -1,71 +1,70 @@
 import pandas as pd
 from pandas import DataFrame
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Per-regime lookups, indexed by regime code (see features._kernel).
+# LOW_VOL stays disabled (was: can_enter True, risk_multiplier 0.2).
+VOL_REGIMES = np.array(["LOW_VOL", "TRADE_OK", "HIGH_VOL"], dtype=object)
+VOL_REGIME_DTYPE = pd.CategoricalDtype(VOL_REGIMES)
+REGIME_CAN_ENTER = np.array([False, True, True])
+REGIME_RISK_MULTIPLIER = np.array([0.0, 0.6, 0.5])
 
 
 # Rolling percentile of the current value within the last W values
-def pct_rank_last(window: np.ndarray) -> float:
-    last = window[-1]
-    # Handle NaNs gracefully
-    if np.isnan(last):
-        return np.nan
-    return float(np.mean(window <= last))
+def rolling_pct_rank(x: np.ndarray, W: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) < W:
+        return out
+
+    win = sliding_window_view(x, W)
+    pct = (win <= win[:, -1:]).mean(axis=1)
+
+    # Like rolling(min_periods=W): any NaN in the window gives NaN
+    nan_cum = np.concatenate(([0], np.cumsum(np.isnan(x))))
+    has_nan = (nan_cum[W:] - nan_cum[:-W]) > 0
+    pct[has_nan] = np.nan
+
+    out[W - 1 :] = pct
+    return out
 
 
+# Inputs are left untouched; outputs are new frames built with assign()
 def get_normalized_atr(ohlcv: DataFrame, window: int = 14) -> DataFrame:
-    df = ohlcv.copy()
+    prev_close = ohlcv["close"].shift()
     tr = np.maximum.reduce(
         [
-            df["high"] - df["low"],
-            np.abs(df["high"] - df["close"].shift()),
-            np.abs(df["low"] - df["close"].shift()),
+            ohlcv["high"] - ohlcv["low"],
+            np.abs(ohlcv["high"] - prev_close),
+            np.abs(ohlcv["low"] - prev_close),
         ]
     )
 
-    df["tr"] = tr
-
-    df["atr"] = df["tr"].rolling(window=window).mean()
-
-    df["norm_atr"] = df["atr"] / df["close"]
-
-    df.drop(columns=["tr"], inplace=True)
+    atr = pd.Series(tr, index=ohlcv.index).rolling(window=window).mean()
 
-    return df
+    return ohlcv.assign(atr=atr, norm_atr=atr / ohlcv["close"])
 
 
 def add_volatility_regime(
     df: DataFrame, W: int = 360, thresholds: tuple = (0.30, 0.65)
 ) -> DataFrame:
-    new_df = df.copy()
-
-    new_df["vol_pct"] = (
-        new_df["norm_atr"]
-        .rolling(window=W, min_periods=W)
-        .apply(pct_rank_last, raw=True)
-    )
+    vol_pct = rolling_pct_rank(df["norm_atr"].to_numpy(), W)
 
-    low_vol_cond = new_df["vol_pct"] < thresholds[0]
-    trade_vol_cond = (thresholds[0] <= new_df["vol_pct"]) & (
-        new_df["vol_pct"] < thresholds[1]
-    )
-    high_vol_cond = new_df["vol_pct"] >= thresholds[1]
+    # Regime codes 0/1/2 index the lookups above; -1 while vol_pct is NaN
+    # (digitize bins: < low -> 0, [low, high) -> 1, >= high or NaN -> 2)
+    codes = np.digitize(vol_pct, [thresholds[0], thresholds[1]]).astype(np.int8)
+    codes[np.isnan(vol_pct)] = -1
 
-    new_df["vol_regime"] = None
-    new_df.loc[low_vol_cond, "vol_regime"] = "LOW_VOL"
-    new_df.loc[trade_vol_cond, "vol_regime"] = "TRADE_OK"
-    new_df.loc[high_vol_cond, "vol_regime"] = "HIGH_VOL"
+    valid = codes >= 0
+    lut_idx = codes.clip(0)
 
-    new_df["can_enter"] = False
-    # new_df.loc[new_df["vol_regime"] == "LOW_VOL", "can_enter"] = True
-    new_df.loc[new_df["vol_regime"] == "TRADE_OK", "can_enter"] = True
-    new_df.loc[new_df["vol_regime"] == "HIGH_VOL", "can_enter"] = True
-
-    new_df["risk_multiplier"] = 0.0
-    # new_df.loc[new_df["vol_regime"] == "LOW_VOL", "risk_multiplier"] = 0.2
-    new_df.loc[new_df["vol_regime"] == "TRADE_OK", "risk_multiplier"] = 0.6
-    new_df.loc[new_df["vol_regime"] == "HIGH_VOL", "risk_multiplier"] = 0.5
-
-    return new_df
+    return df.assign(
+        vol_pct=vol_pct,
+        vol_regime=pd.Categorical.from_codes(codes, dtype=VOL_REGIME_DTYPE),
+        can_enter=np.where(valid, REGIME_CAN_ENTER[lut_idx], False),
+        risk_multiplier=np.where(valid, REGIME_RISK_MULTIPLIER[lut_idx], 0.0),
+    )
 
 
 def add_volatility_features(
@@ -1,16 +1,25 @@
 from pandas import DataFrame
+import numpy as np
 import pandas as pd
 
+from src.core.utils import HAS_NUMBA, ensure_sorted
 from src.features.trend import (
     add_daily_ema_bias,
     add_trend_ok_to_execution,
     add_can_trade,
 )
-from src.features.volatility import add_volatility_features
+from src.features.volatility import (
+    add_volatility_features,
+    VOL_REGIME_DTYPE,
+    REGIME_CAN_ENTER,
+    REGIME_RISK_MULTIPLIER,
+)
+from src.features._kernel import compute_all, ewm_alpha
 from src.strategies.trend_pullback import (
-    add_trend_pullback_indicators,
     add_entry_signals,
     add_initial_stop_and_risk,
+    add_trend_pullback_indicators,
+    trend_pullback_signal_columns,
 )
 
 
@@ -39,10 +48,19 @@ def add_permissions(df_4h: DataFrame, df_1d: DataFrame) -> DataFrame:
 def add_strategy_signals(
     df_4h: DataFrame, *, ema_fast: int = 50, ema_slow: int = 200, k_stop: float = 1.5
 ) -> DataFrame:
-    df_4h = add_trend_pullback_indicators(df_4h, ema_fast, ema_slow)
-    df_4h = add_entry_signals(df_4h)
-    df_4h = add_initial_stop_and_risk(df_4h, k=k_stop)
-    return df_4h
+    if not HAS_NUMBA:
+        # Uncompiled, the fused signal loop is plain Python; the staged
+        # functions stay vectorised
+        df_4h = add_trend_pullback_indicators(df_4h, ema_fast, ema_slow)
+        df_4h = add_entry_signals(df_4h)
+        return add_initial_stop_and_risk(df_4h, k=k_stop)
+
+    # New columns arrive as their own frame; the 4H frame's blocks are not copied.
+    # Signal columns from an earlier run (e.g. a k_stop sweep) are replaced.
+    df_4h = ensure_sorted(df_4h)
+    signals = trend_pullback_signal_columns(df_4h, ema_fast, ema_slow, k=k_stop)
+    df_4h = df_4h.drop(columns=signals.columns, errors="ignore")
+    return pd.concat([df_4h, signals], axis=1)
 
 
 def build_execution_frame(
@@ -57,8 +75,10 @@ def build_execution_frame(
     ema_slow: int = 200,
     k_stop: float = 1.5,
 ) -> DataFrame:
-    d4 = df_4h.copy()
-    d1 = df_1d.copy()
+    # Inputs are only read below (new columns go through assign), so an
+    # already sorted frame is used as is
+    d4 = ensure_sorted(df_4h)
+    d1 = ensure_sorted(df_1d)
 
     # Basic sanity (lightweight, not full validation)
     if not isinstance(d4.index, pd.DatetimeIndex) or not isinstance(
@@ -68,28 +88,31 @@ def build_execution_frame(
     if d4.index.tz is None or d1.index.tz is None:
         raise RuntimeError("PIPELINE ERROR: indices must be timezone-aware (UTC).")
 
-    d4.sort_index(inplace=True)
-    d1.sort_index(inplace=True)
-
     d1_feat = build_features_1d(d1, ema_span=ema_span_1d)
 
-    d4_feat = build_features_4h_base(
-        d4,
-        atr_window=atr_window,
-        pct_window=pct_window,
-        thresholds=thresholds,
-    )
-
-    d4_perm = add_permissions(d4_feat, d1_feat)
-
-    d4_final = add_strategy_signals(
-        d4_perm,
-        ema_fast=ema_fast,
-        ema_slow=ema_slow,
-        k_stop=k_stop,
-    )
-
-    d4_final.sort_index(inplace=True)
+    if HAS_NUMBA:
+        d4_final = _build_fused_4h(
+            d4,
+            d1_feat,
+            atr_window=atr_window,
+            pct_window=pct_window,
+            thresholds=thresholds,
+            ema_fast=ema_fast,
+            ema_slow=ema_slow,
+            k_stop=k_stop,
+        )
+    else:
+        # Uncompiled, the fused kernel is a Python loop with an O(N * W)
+        # percentile scan; the staged functions stay vectorised
+        d4_final = build_features_4h_base(
+            d4, atr_window=atr_window, pct_window=pct_window, thresholds=thresholds
+        )
+        d4_final = add_permissions(d4_final, d1_feat)
+        d4_final = add_strategy_signals(
+            d4_final, ema_fast=ema_fast, ema_slow=ema_slow, k_stop=k_stop
+        )
+
+    d4_final = ensure_sorted(d4_final)
 
     required = {
         "entry_long",
@@ -104,3 +127,74 @@ def build_execution_frame(
         raise RuntimeError(f"PIPELINE ERROR: missing required columns {missing}")
 
     return d4_final
+
+
+def _build_fused_4h(
+    d4: DataFrame,
+    d1_feat: DataFrame,
+    *,
+    atr_window: int,
+    pct_window: int,
+    thresholds: tuple,
+    ema_fast: int,
+    ema_slow: int,
+    k_stop: float,
+) -> DataFrame:
+    trend_ok = add_trend_ok_to_execution(d4, d1_feat)["trend_ok"]
+
+    # One fused pass over the 4H arrays replaces the staged feature functions
+    # (build_features_4h_base -> add_permissions -> add_strategy_signals)
+    (
+        atr,
+        norm_atr,
+        vol_pct,
+        regime,
+        can_enter,
+        risk_multiplier,
+        can_trade,
+        ema_fast_4h,
+        ema_slow_4h,
+        trend_4h_ok,
+        pullback,
+        bullish,
+        entry_long,
+        entry_price,
+        stop_price,
+        risk_per_unit,
+    ) = compute_all(
+        d4["open"].to_numpy(dtype=np.float64),
+        d4["high"].to_numpy(dtype=np.float64),
+        d4["low"].to_numpy(dtype=np.float64),
+        d4["close"].to_numpy(dtype=np.float64),
+        trend_ok.to_numpy(),
+        ewm_alpha(ema_fast),
+        ewm_alpha(ema_slow),
+        atr_window,
+        pct_window,
+        thresholds[0],
+        thresholds[1],
+        k_stop,
+        REGIME_CAN_ENTER,
+        REGIME_RISK_MULTIPLIER,
+    )
+
+    return d4.assign(
+        atr=atr,
+        norm_atr=norm_atr,
+        vol_pct=vol_pct,
+        vol_regime=pd.Categorical.from_codes(regime, dtype=VOL_REGIME_DTYPE),
+        can_enter=can_enter,
+        risk_multiplier=risk_multiplier,
+        trend_ok=trend_ok,
+        can_trade=can_trade,
+        ema_fast_4h=ema_fast_4h,
+        ema_slow_4h=ema_slow_4h,
+        trend_4h_ok=trend_4h_ok,
+        pullback_reclaim_ema_fast=pullback,
+        bullish_candle=bullish,
+        entry_long=entry_long,
+        entry_price=entry_price,
+        stop_price=stop_price,
+        risk_per_unit=risk_per_unit,
+        stop_distance=risk_per_unit.copy(),
+    )
@@ -1,21 +1,33 @@
-from src.data_layer.storage import load_ohlcv
-from src.orchestration.pipeline import build_execution_frame
-from src.backtest.simulator import run_simulation
-from src.backtest.metrics import compute_trade_metrics, compute_equity_metrics
-from src.backtest.reports import save_backtest_outputs, build_report_pack
-
+# pandas/numpy-heavy modules are imported inside run_backtest_job and main,
+# so loading and checking settings stays cheap
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import copy
+import functools
 from pathlib import Path
 import yaml
 from datetime import datetime, timezone
 
 
+# libyaml-backed loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def load_settings(path: str | Path) -> dict:
     path = Path(path)
-    if not path.exists():
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
         raise RuntimeError(f"SETTINGS ERROR: settings file not found: {path}")
 
-    with path.open("r", encoding="utf-8") as f:
-        cfg = yaml.safe_load(f)
+    # Copy so callers can't mutate the cached parse
+    return copy.deepcopy(_load_settings_cached(str(path), mtime_ns))
+
+
+@functools.lru_cache(maxsize=8)
+def _load_settings_cached(path: str, mtime_ns: int) -> dict:
+    # mtime_ns is only part of the cache key: editing the file invalidates it
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.load(f, Loader=_YAML_LOADER)
 
     if not isinstance(cfg, dict):
         raise RuntimeError("SETTINGS ERROR: YAML must parse into a dict.")
@@ -100,21 +112,26 @@ def run_backtest_job(
     cost_rate: float,
     max_hold_bars: int,
 ) -> dict:
-    df_4h = load_ohlcv(
-        exchange=exchange, symbol=symbol, timeframe=timeframe_4h, root_dir=root_dir
-    )
-    df_1d = load_ohlcv(
-        exchange=exchange, symbol=symbol, timeframe=timeframe_1d, root_dir=root_dir
+    from src.data_layer.storage import load_ohlcv
+    from src.orchestration.pipeline import build_execution_frame
+    from src.backtest.simulator import run_simulation
+    from src.backtest.metrics import (
+        compute_trade_metrics,
+        compute_equity_arrays,
+        compute_equity_metrics,
     )
 
+    # The two loads are independent file reads; overlap them
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        f_4h = pool.submit(load_ohlcv, exchange, symbol, timeframe_4h, root_dir)
+        f_1d = pool.submit(load_ohlcv, exchange, symbol, timeframe_1d, root_dir)
+        df_4h, df_1d = f_4h.result(), f_1d.result()
+
     if df_4h is None or df_4h.empty:
         raise RuntimeError("BACKTEST ERROR: 4H dataframe is missing/empty.")
     if df_1d is None or df_1d.empty:
         raise RuntimeError("BACKTEST ERROR: 1D dataframe is missing/empty.")
 
-    df_4h = df_4h.sort_index()
-    df_1d = df_1d.sort_index()
-
     execution_df = build_execution_frame(
         df_4h,
         df_1d,
@@ -138,7 +155,8 @@ def run_backtest_job(
         max_hold_bars=max_hold_bars,
     )
 
-    equity_metrics = compute_equity_metrics(equity_df)
+    equity_arrays = compute_equity_arrays(equity_df)
+    equity_metrics = compute_equity_metrics(equity_df, equity_arrays)
 
     if trades_df is None or trades_df.empty:
         trade_metrics = {}
@@ -153,6 +171,8 @@ def run_backtest_job(
         "equity_df": equity_df,
         "trade_metrics": trade_metrics,
         "equity_metrics": equity_metrics,
+        # (eq, hwm, dd, index) from compute_equity_arrays, reused by the report
+        "_eq": equity_arrays,
         "counts": {
             "entry_long": entry_long_count,
             "can_trade": can_trade_count,
@@ -180,7 +200,21 @@ def run_backtest_job(
     }
 
 
+def run_backtest_batch(
+    job_args: list[dict], max_workers: int | None = None
+) -> list[dict]:
+    """
+    Run several backtests (e.g. one per symbol) in separate processes.
+    `job_args` items are settings_to_job_args() outputs; results keep their order.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_backtest_job, **args) for args in job_args]
+        return [f.result() for f in futures]
+
+
 def main():
+    from src.backtest.reports import save_backtest_outputs, build_report_pack
+
     project_root = Path(__file__).resolve().parents[2]
     cfg = load_settings(project_root / "config" / "setting.yaml")
     args = settings_to_job_args(cfg)
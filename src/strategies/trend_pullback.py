@@ -1,61 +1,260 @@
 import pandas as pd
 import numpy as np
 from pandas import DataFrame
+from src.core.utils import HAS_NUMBA, ensure_sorted
+from src.features._kernel import (
+    compute_signals,
+    compute_signals_2d,
+    ema_adjust_false_dual,
+    ema_extend,
+    ewm_alpha,
+    ewm_old_wt,
+)
+
+
+# Each stage works on a shallow copy: under pandas copy-on-write, new or
+# rewritten columns never reach the caller's frame, and nothing is deep-copied
 
 
 def add_trend_pullback_indicators(
     df_4h: DataFrame, ema_fast: int = 50, ema_slow: int = 200
 ) -> DataFrame:
-    df = df_4h.copy()
-    df.sort_index(inplace=True)
-    df["ema_fast_4h"] = df["close"].ewm(span=ema_fast, adjust=False).mean()
-    df["ema_slow_4h"] = df["close"].ewm(span=ema_slow, adjust=False).mean()
+    df = ensure_sorted(df_4h.copy(deep=False))
+    # Both EMAs come from one compiled ewm(adjust=False) pass over the close buffer
+    close = df["close"].to_numpy(dtype=np.float64)
+    df["ema_fast_4h"], df["ema_slow_4h"] = ema_adjust_false_dual(
+        close, ema_fast, ema_slow
+    )
+    return _add_ema_flags(df, close)
 
-    df["trend_4h_ok"] = (
-        df["ema_fast_4h"] > df["ema_slow_4h"]
-    )  # Shows sustained upward momentum
 
-    cond = (df["low"] <= df["ema_fast_4h"]) & (
-        df["close"] > df["ema_fast_4h"]
-    )  # This condition ensures pullback up was successfull after the low <= ema_fast but close > ema_fast
-    df["pullback_reclaim_ema_fast"] = cond
+def add_trend_pullback_indicators_incremental(
+    df_new: DataFrame,
+    prev_state: dict | None = None,
+    ema_fast: int = 50,
+    ema_slow: int = 200,
+) -> tuple[DataFrame, dict]:
+    """
+    add_trend_pullback_indicators for bars appended since the previous call:
+    the EMAs resume from prev_state instead of being rebuilt from the whole
+    history. Returns the frame and the state to pass with the next batch.
+    """
+    fast_alpha, slow_alpha = ewm_alpha(ema_fast), ewm_alpha(ema_slow)
+    if not prev_state:
+        df = add_trend_pullback_indicators(df_new, ema_fast, ema_slow)
+        close = df["close"].to_numpy(dtype=np.float64)
+        fast_old_wt = ewm_old_wt(close, fast_alpha)
+        slow_old_wt = ewm_old_wt(close, slow_alpha)
+    else:
+        df = ensure_sorted(df_new.copy(deep=False))
+        close = df["close"].to_numpy(dtype=np.float64)
+        # old_wt carries the decay of a trailing NaN gap into this batch
+        df["ema_fast_4h"], fast_old_wt = ema_extend(
+            close,
+            prev_state["ema_fast_last"],
+            prev_state.get("ema_fast_old_wt", 1.0),
+            fast_alpha,
+        )
+        df["ema_slow_4h"], slow_old_wt = ema_extend(
+            close,
+            prev_state["ema_slow_last"],
+            prev_state.get("ema_slow_old_wt", 1.0),
+            slow_alpha,
+        )
+        df = _add_ema_flags(df, close)
 
-    df["bullish_candle"] = (
-        df["close"] > df["open"]
-    )  # To enter when the momentum shifts.
+    if df.empty:
+        return df, dict(prev_state or {})
+    state = {
+        "ema_fast_last": float(df["ema_fast_4h"].iat[-1]),
+        "ema_slow_last": float(df["ema_slow_4h"].iat[-1]),
+        "ema_fast_old_wt": fast_old_wt,
+        "ema_slow_old_wt": slow_old_wt,
+    }
+    return df, state
 
-    return df
+
+def _add_ema_flags(df: DataFrame, close: np.ndarray) -> DataFrame:
+    ema_fast_arr = df["ema_fast_4h"].to_numpy()
+    return df.assign(
+        # Shows sustained upward momentum
+        trend_4h_ok=ema_fast_arr > df["ema_slow_4h"].to_numpy(),
+        # This condition ensures pullback up was successfull after the low <= ema_fast but close > ema_fast
+        pullback_reclaim_ema_fast=(df["low"].to_numpy() <= ema_fast_arr)
+        & (close > ema_fast_arr),
+        # To enter when the momentum shifts.
+        bullish_candle=close > df["open"].to_numpy(),
+    )
 
 
-def add_entry_signals(df_4h: DataFrame) -> DataFrame:
-    df = df_4h.copy()
-    entry_long_cond = (
-        df["can_trade"]
-        & df["trend_4h_ok"]
-        & df["pullback_reclaim_ema_fast"]
-        & df["bullish_candle"]
+def add_trend_pullback_signals_batch(
+    frames: dict[str, DataFrame],
+    ema_fast: int = 50,
+    ema_slow: int = 200,
+    k: float = 1.5,
+) -> dict[str, DataFrame]:
+    """
+    add_trend_pullback_indicators -> add_entry_signals -> add_initial_stop_and_risk
+    for several symbols on one shared time index. Inputs are stacked into
+    (T, S) blocks and compute_signals runs once per symbol column, in parallel.
+    """
+    if not frames:
+        return {}
+    frames = {sym: ensure_sorted(df) for sym, df in frames.items()}
+    index = next(iter(frames.values())).index
+    if any(not df.index.equals(index) for df in frames.values()):
+        raise RuntimeError(
+            "INPUT ERROR: Batched frames must share the same timestamp index."
+        )
+    if not HAS_NUMBA:
+        return {
+            sym: add_initial_stop_and_risk(
+                add_entry_signals(
+                    add_trend_pullback_indicators(df, ema_fast, ema_slow)
+                ),
+                k,
+            )
+            for sym, df in frames.items()
+        }
+
+    def stack(col: str, dtype=np.float64, **kwargs) -> np.ndarray:
+        # Column-major, so each symbol's series is contiguous for the scan
+        block = np.empty((len(index), len(frames)), dtype=dtype, order="F")
+        for j, df in enumerate(frames.values()):
+            block[:, j] = df[col].to_numpy(dtype=dtype, **kwargs)
+        return block
+
+    (
+        ema_fast_4h,
+        ema_slow_4h,
+        trend_4h_ok,
+        pullback,
+        bullish,
+        entry_long,
+        entry_price,
+        stop_price,
+        risk_per_unit,
+    ) = compute_signals_2d(
+        stack("open"),
+        stack("low"),
+        stack("close"),
+        stack("atr"),
+        stack("can_trade", dtype=bool, na_value=False),
+        ewm_alpha(ema_fast),
+        ewm_alpha(ema_slow),
+        k,
     )
-    df["entry_long"] = entry_long_cond.fillna(False)
 
-    df["entry_price"] = np.nan
-    entry_price_cond = df["entry_long"]
-    df.loc[entry_price_cond, "entry_price"] = df["close"]
+    return {
+        sym: df.assign(
+            ema_fast_4h=ema_fast_4h[:, j],
+            ema_slow_4h=ema_slow_4h[:, j],
+            trend_4h_ok=trend_4h_ok[:, j],
+            pullback_reclaim_ema_fast=pullback[:, j],
+            bullish_candle=bullish[:, j],
+            entry_long=entry_long[:, j],
+            entry_price=entry_price[:, j],
+            stop_price=stop_price[:, j],
+            risk_per_unit=risk_per_unit[:, j],
+            # Stop distance is same as risk per unit, but for debugging
+            stop_distance=risk_per_unit[:, j],
+        )
+        for j, (sym, df) in enumerate(frames.items())
+    }
+
+
+def add_entry_signals(df_4h: DataFrame) -> DataFrame:
+    df = df_4h.copy(deep=False)
+    # Flags enter as plain np.bool_ (missing -> False), so the reduction never
+    # takes the object/nullable path and needs no fillna afterwards. Nullable
+    # or object flag columns are also written back as plain bool, once.
+    flags = []
+    for col in (
+        "can_trade",
+        "trend_4h_ok",
+        "pullback_reclaim_ema_fast",
+        "bullish_candle",
+    ):
+        flag = df[col].to_numpy(dtype=bool, na_value=False)
+        if df[col].dtype != bool:
+            df[col] = flag
+        flags.append(flag)
+    entry_long_cond = np.logical_and.reduce(flags)
+    df["entry_long"] = entry_long_cond
+
+    entry_idx = np.flatnonzero(entry_long_cond)
+    entry_price = np.full(len(df), np.nan)
+    entry_price[entry_idx] = df["close"].to_numpy()[entry_idx]
+    df["entry_price"] = entry_price
 
     return df
 
 
 def add_initial_stop_and_risk(df_4h:DataFrame, k:float=1.5)->DataFrame:
-    df = df_4h.copy()
-    df["stop_price"] = np.nan
-    df.loc[df["entry_long"],"stop_price"] = df["entry_price"] - k * df["atr"]
+    df = df_4h.copy(deep=False)
+    # Entries are sparse: do the k * atr arithmetic on the entry rows only
+    entry_idx = np.flatnonzero(df["entry_long"].to_numpy())
+    entry_price = df["entry_price"].to_numpy()[entry_idx]
+    stop = entry_price - k * df["atr"].to_numpy()[entry_idx]
 
-    df["risk_per_unit"] = np.nan
-    df.loc[df["entry_long"],"risk_per_unit"] = df["entry_price"] - df["stop_price"]
+    # One (N, 3) float64 block instead of three separately allocated columns;
+    # stop distance is same as risk per unit, kept as a debugging alias
+    cols = ["stop_price", "risk_per_unit", "stop_distance"]
+    out = np.full((len(df), 3), np.nan)
+    out[entry_idx, 0] = stop
+    out[entry_idx, 1:] = (entry_price - stop)[:, None]
 
-    # Stop distance is same as risk per unit, but for debugging
-    df["stop_distance"] = np.nan
-    df.loc[df["entry_long"],"stop_distance"] = df["entry_price"] - df["stop_price"]
-    return df
+    # concat keeps the block whole; column-wise setitem would split it
+    block = DataFrame(out, index=df.index, columns=cols, copy=False)
+    return pd.concat([df.drop(columns=cols, errors="ignore"), block], axis=1)
+
+
+def trend_pullback_signal_columns(
+    df_4h: DataFrame, ema_fast: int = 50, ema_slow: int = 200, k: float = 1.5
+) -> DataFrame:
+    """
+    add_trend_pullback_indicators -> add_entry_signals -> add_initial_stop_and_risk
+    fused into one compiled pass. Returns only the new columns (same names and
+    values) on df_4h's sorted index, for the caller to concat onto df_4h.
+    """
+    df = ensure_sorted(df_4h)
+    (
+        ema_fast_4h,
+        ema_slow_4h,
+        trend_4h_ok,
+        pullback,
+        bullish,
+        entry_long,
+        entry_price,
+        stop_price,
+        risk_per_unit,
+    ) = compute_signals(
+        df["open"].to_numpy(dtype=np.float64),
+        df["low"].to_numpy(dtype=np.float64),
+        df["close"].to_numpy(dtype=np.float64),
+        df["atr"].to_numpy(dtype=np.float64),
+        df["can_trade"].to_numpy(dtype=bool, na_value=False),
+        ewm_alpha(ema_fast),
+        ewm_alpha(ema_slow),
+        k,
+    )
+    # Stop distance is same as risk per unit, but for debugging. The dict is
+    # copied into one 2-D block per dtype, so no two columns share a buffer.
+    return DataFrame(
+        {
+            "ema_fast_4h": ema_fast_4h,
+            "ema_slow_4h": ema_slow_4h,
+            "trend_4h_ok": trend_4h_ok,
+            "pullback_reclaim_ema_fast": pullback,
+            "bullish_candle": bullish,
+            "entry_long": entry_long,
+            "entry_price": entry_price,
+            "stop_price": stop_price,
+            "risk_per_unit": risk_per_unit,
+            "stop_distance": risk_per_unit,
+        },
+        index=df.index,
+    )
 
 
 ###################### TESTS #####################
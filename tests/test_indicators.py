@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features._kernel import ema_step, ewm_alpha
+from src.strategies.trend_pullback import (
+    add_entry_signals,
+    add_initial_stop_and_risk,
+    add_trend_pullback_indicators,
+    add_trend_pullback_indicators_incremental,
+    add_trend_pullback_signals_batch,
+)
+
+
+@pytest.mark.parametrize("cuts", [(150,), (100, 158, 163), (40, 155, 200)])
+def test_incremental_emas_match_full_ewm_across_nan_gaps(cuts):
+    n = 300
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    close[150:160] = np.nan  # gap straddling (or filling) a batch boundary
+    df = pd.DataFrame(
+        {"open": close, "high": close, "low": close, "close": close},
+        index=pd.date_range("2024-01-01", periods=n, freq="4h", tz="UTC"),
+    )
+
+    parts, state, start = [], None, 0
+    for stop in (*cuts, n):
+        part, state = add_trend_pullback_indicators_incremental(
+            df.iloc[start:stop], state, ema_fast=10, ema_slow=30
+        )
+        parts.append(part)
+        start = stop
+    out = pd.concat(parts)
+
+    for col, span in (("ema_fast_4h", 10), ("ema_slow_4h", 30)):
+        expected = df["close"].ewm(span=span, adjust=False).mean()
+        np.testing.assert_array_equal(out[col].to_numpy(), expected.to_numpy())
+
+
+def test_signals_batch_matches_staged_chain():
+    n = 400
+    index = pd.date_range("2024-01-01", periods=n, freq="4h", tz="UTC")
+    frames = {}
+    for seed, sym in enumerate(("BTC/USD", "ETH/USD", "SOL/USD")):
+        rng = np.random.default_rng(seed)
+        close = 100 + np.cumsum(rng.normal(size=n))
+        open_ = close + rng.normal(scale=0.5, size=n)
+        low = np.minimum(open_, close) - rng.uniform(0, 2, size=n)
+        frames[sym] = pd.DataFrame(
+            {
+                "open": open_,
+                "high": np.maximum(open_, close) + rng.uniform(0, 2, size=n),
+                "low": low,
+                "close": close,
+                "atr": rng.uniform(0.5, 2, size=n),
+                "can_trade": rng.random(n) < 0.7,
+            },
+            index=index,
+        )
+    frames["ETH/USD"].iloc[200:205, :4] = np.nan
+
+    out = add_trend_pullback_signals_batch(frames, ema_fast=10, ema_slow=30, k=2.0)
+
+    assert list(out) == list(frames)
+    for sym, df in frames.items():
+        expected = add_initial_stop_and_risk(
+            add_entry_signals(add_trend_pullback_indicators(df, 10, 30)), 2.0
+        )
+        assert expected["entry_long"].any()
+        pd.testing.assert_frame_equal(out[sym], expected)
+
+
+def test_ema_step_matches_full_ewm():
+    rng = np.random.default_rng(1)
+    close = 100 + np.cumsum(rng.normal(size=120))
+    close[60:64] = np.nan
+    alpha = ewm_alpha(20)
+
+    ema, old_wt, out = np.nan, 1.0, []
+    for x in close:
+        ema, old_wt = ema_step(ema, x, alpha, old_wt)
+        out.append(ema)
+
+    expected = pd.Series(close).ewm(span=20, adjust=False).mean()
+    np.testing.assert_array_equal(np.array(out), expected.to_numpy())
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.orchestration import pipeline
+from src.orchestration.pipeline import add_strategy_signals, build_execution_frame
+
+
+def _make_ohlcv(n, freq, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))
+    index = pd.date_range("2022-01-01", periods=n, freq=freq, tz="UTC")
+    return pd.DataFrame(
+        {
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": rng.uniform(1, 10, n),
+        },
+        index=index,
+    )
+
+
+def test_add_strategy_signals_replaces_existing_signal_columns():
+    df_4h = _make_ohlcv(1200, "4h", 0)
+    df_1d = _make_ohlcv(220, "1D", 1)
+    frame = build_execution_frame(
+        df_4h, df_1d, ema_span_1d=20, pct_window=50, k_stop=1.5
+    )
+
+    resized = add_strategy_signals(frame, k_stop=3.0)
+    again = add_strategy_signals(resized, k_stop=3.0)
+
+    assert list(resized.columns) == list(frame.columns)
+    assert resized.columns.is_unique
+    pd.testing.assert_frame_equal(again, resized)
+    entries = resized["entry_long"].to_numpy()
+    np.testing.assert_allclose(
+        resized["risk_per_unit"].to_numpy()[entries],
+        3.0 * resized["atr"].to_numpy()[entries],
+    )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"atr_window": 5, "pct_window": 30, "thresholds": (0.2, 0.8), "k_stop": 2.5},
+        {"ema_fast": 8, "ema_slow": 40, "pct_window": 120, "k_stop": 1.0},
+    ],
+)
+def test_fused_frame_matches_staged_frame(monkeypatch, params):
+    df_4h = _make_ohlcv(1500, "4h", 2)
+    df_1d = _make_ohlcv(260, "1D", 3)
+    params = {"ema_span_1d": 20, "pct_window": 60, **params}
+
+    monkeypatch.setattr(pipeline, "HAS_NUMBA", True)
+    fused = build_execution_frame(df_4h, df_1d, **params)
+    monkeypatch.setattr(pipeline, "HAS_NUMBA", False)
+    staged = build_execution_frame(df_4h, df_1d, **params)
+
+    pd.testing.assert_frame_equal(fused, staged, check_exact=True)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from src.features._kernel import rolling_pct_rank_fenwick
+from src.features.volatility import rolling_pct_rank
+
+
+@pytest.mark.parametrize("window", [1, 3, 25])
+def test_fenwick_pct_rank_matches_window_scan(window):
+    rng = np.random.default_rng(4)
+    # Rounded values force ties; scattered NaNs blank the windows holding them
+    x = np.round(rng.normal(size=400), 1)
+    x[[0, 57, 58, 250]] = np.nan
+
+    np.testing.assert_array_equal(
+        rolling_pct_rank_fenwick(x, window), rolling_pct_rank(x, window)
+    )
+
+
+def test_fenwick_pct_rank_short_and_all_nan_input():
+    assert np.isnan(rolling_pct_rank_fenwick(np.array([1.0, 2.0]), 3)).all()
+    assert np.isnan(rolling_pct_rank_fenwick(np.full(5, np.nan), 2)).all()
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest.simulator import run_simulation
+
+CASH = 10000.0
+
+
+def _frame(n, entries=(), **overrides):
+    """
+    Flat 100-priced bars; each entry bar buys at 100 with a 95 stop
+    (1R = 5, so TP1 sits at 105). Column overrides map bar -> value.
+    """
+    cols = {
+        "high": np.full(n, 100.0),
+        "low": np.full(n, 100.0),
+        "close": np.full(n, 100.0),
+        "entry_long": np.zeros(n, dtype=bool),
+        "entry_price": np.full(n, np.nan),
+        "stop_price": np.full(n, np.nan),
+        "risk_per_unit": np.full(n, np.nan),
+        "can_trade": np.ones(n, dtype=bool),
+        "risk_multiplier": np.ones(n),
+        "ema_fast_4h": np.full(n, np.nan),
+        "vol_regime": np.full(n, "TRADE_OK", dtype=object),
+    }
+    for i in entries:
+        cols["entry_long"][i] = True
+        cols["entry_price"][i] = 100.0
+        cols["stop_price"][i] = 95.0
+        cols["risk_per_unit"][i] = 5.0
+    for col, values in overrides.items():
+        for i, value in values.items():
+            cols[col][i] = value
+    index = pd.date_range("2024-01-01", periods=n, freq="4h", tz="UTC")
+    return pd.DataFrame(cols, index=index)
+
+
+def _run(df, **kwargs):
+    return run_simulation(df, initial_cash=CASH, cost_rate=0.0, **kwargs)
+
+
+def test_stop_beats_tp1_on_the_same_bar():
+    df = _frame(5, entries=[0], low={1: 94.0}, high={1: 106.0})
+    trades, _ = _run(df)
+
+    assert len(trades) == 1
+    trade = trades.iloc[0]
+    assert trade["reason"] == "STOP"
+    assert trade["exit_time"] == df.index[1]
+    assert trade["exit_price"] == 95.0
+    assert not trade["partial_taken"]
+    assert trade["pnl_usd"] == pytest.approx(-100.0)  # 20 units * -5
+    assert trade["r_multiple"] == pytest.approx(-1.0)
+
+
+def test_tp1_beats_permission_then_permission_exits():
+    df = _frame(
+        5,
+        entries=[0],
+        high={1: 106.0},
+        close={2: 104.0},
+        can_trade={1: False, 2: False},
+    )
+    trades, _ = _run(df)
+
+    trade = trades.iloc[0]
+    assert trade["reason"] == "PERMISSION"
+    assert trade["exit_time"] == df.index[2]
+    assert trade["partial_taken"]
+    assert trade["remaining_units"] == pytest.approx(10.0)
+    assert trade["pnl_usd"] == pytest.approx(10 * 5.0 + 10 * 4.0)
+
+
+def test_time_exit_after_ten_bars_without_high_vol():
+    # max_hold_bars only applies to HIGH_VOL entries; others hold 10 bars
+    df = _frame(20, entries=[0])
+    trades, _ = _run(df, max_hold_bars=4)
+
+    assert trades["reason"].tolist() == ["TIME"]
+    assert trades["exit_time"].iloc[0] == df.index[11]
+
+
+def test_permission_beats_time_on_the_same_bar():
+    df = _frame(20, entries=[0], can_trade={11: False})
+    trades, _ = _run(df)
+
+    assert trades["reason"].tolist() == ["PERMISSION"]
+    assert trades["exit_time"].iloc[0] == df.index[11]
+
+
+def test_high_vol_entry_uses_max_hold_bars():
+    df = _frame(20, entries=[0], vol_regime={0: "HIGH_VOL"})
+    trades, _ = _run(df, max_hold_bars=4)
+
+    assert trades["reason"].tolist() == ["TIME"]
+    assert trades["exit_time"].iloc[0] == df.index[5]
+
+
+def test_nan_bars_skip_price_exits_and_mark_equity_at_cash():
+    df = _frame(
+        5,
+        entries=[0],
+        high={1: np.nan},
+        low={1: np.nan},
+        close={1: np.nan, 2: 101.0},
+        can_trade={1: False, 2: False},
+    )
+    trades, equity = _run(df)
+
+    assert trades["reason"].tolist() == ["PERMISSION"]
+    assert trades["exit_time"].iloc[0] == df.index[2]
+    # 20 units bought at 100: bar 1 has no close to mark, so equity is cash
+    assert equity["equity"].iloc[1] == pytest.approx(CASH - 2000.0)
+    assert equity["equity"].iloc[2] == pytest.approx(CASH + 20.0)
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"risk_per_unit": {0: np.nan}},
+        {"risk_per_unit": {0: 0.0}},
+        {"risk_per_unit": {0: -5.0}},
+        {"entry_price": {0: np.nan}},
+        {"risk_multiplier": {0: 0.0}},
+        {"risk_multiplier": {0: np.nan}},
+    ],
+)
+def test_entries_with_invalid_risk_are_skipped(overrides):
+    trades, equity = _run(_frame(5, entries=[0], **overrides))
+
+    assert trades.empty
+    assert (equity["equity"] == CASH).all()
+
+
+def test_entry_with_nan_stop_never_stops_out():
+    df = _frame(20, entries=[0], stop_price={0: np.nan}, low={3: 50.0})
+    trades, _ = _run(df)
+
+    assert trades["reason"].tolist() == ["TIME"]
+    assert trades["exit_time"].iloc[0] == df.index[11]
+
+
+def test_trade_buffer_grows_past_initial_capacity():
+    n_trades = 150
+    n = 2 * n_trades
+    df = _frame(
+        n,
+        entries=range(0, n, 2),
+        low={i: 94.0 for i in range(1, n, 2)},
+    )
+    trades, _ = _run(df)
+
+    assert len(trades) == n_trades
+    assert (trades["reason"] == "STOP").all()
+    assert trades["entry_time"].tolist() == df.index[0::2].tolist()
+    assert trades["exit_time"].tolist() == df.index[1::2].tolist()
+
+
+def test_quiet_bar_skip_lands_on_permission_exit():
+    close = {i: 100.0 + i / 10 for i in range(1, 6)}
+    df = _frame(10, entries=[0], close=close, can_trade={5: False})
+    trades, equity = _run(df)
+
+    assert trades["reason"].tolist() == ["PERMISSION"]
+    assert trades["exit_time"].iloc[0] == df.index[5]
+    assert trades["pnl_usd"].iloc[0] == pytest.approx(20 * 0.5)
+    # Skipped bars are still marked to market with the open position
+    expected = [CASH] + [CASH - 2000.0 + 20 * close[i] for i in range(1, 5)]
+    np.testing.assert_allclose(equity["equity"].iloc[:5], expected)
+    assert equity["equity"].iloc[5] == pytest.approx(CASH + 10.0)
+
+
+def test_stop_touch_beats_permission_at_the_end_of_a_quiet_run():
+    df = _frame(10, entries=[0], low={4: 94.0}, can_trade={4: False})
+    trades, _ = _run(df)
+
+    assert trades["reason"].tolist() == ["STOP"]
+    assert trades["exit_time"].iloc[0] == df.index[4]
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_layer import storage
+from src.data_layer.storage import get_ohlcv_path, load_ohlcv, save_ohlcv
+
+ARGS = ("kraken", "BTC/USD", "4h")
+
+pytestmark = pytest.mark.skipif(not storage.HAS_PYARROW, reason="needs pyarrow")
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    storage._load_validated_ohlcv.cache_clear()
+    yield
+    storage._load_validated_ohlcv.cache_clear()
+
+
+def _make_ohlcv(n=60, volume=5.0):
+    close = 100 + np.arange(n, dtype=np.float64)
+    # Loaded frames carry no freq, so the input has none either
+    index = pd.DatetimeIndex(
+        pd.date_range("2024-01-01", periods=n, freq="4h", tz="UTC"),
+        freq=None,
+        name="timestamp",
+    )
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": np.full(n, volume),
+        },
+        index=index.as_unit("ns"),
+    )
+
+
+def _reload(root):
+    storage._load_validated_ohlcv.cache_clear()  # only the snapshot may answer
+    return load_ohlcv(*ARGS, root)
+
+
+def test_parquet_round_trip(tmp_path):
+    df = _make_ohlcv()
+    save_ohlcv(df, *ARGS, str(tmp_path))
+
+    assert os.path.exists(get_ohlcv_path(*ARGS, str(tmp_path)))
+    pd.testing.assert_frame_equal(load_ohlcv(*ARGS, str(tmp_path)), df)
+    # Second read comes from the feather snapshot
+    pd.testing.assert_frame_equal(_reload(str(tmp_path)), df)
+
+
+def test_csv_round_trip_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "HAS_PYARROW", False)
+    df = _make_ohlcv().tz_convert("Europe/Berlin")
+    save_ohlcv(df, *ARGS, str(tmp_path))
+
+    assert os.path.exists(get_ohlcv_path(*ARGS, str(tmp_path), ext="csv"))
+    loaded = load_ohlcv(*ARGS, str(tmp_path))
+    assert str(loaded.index.tz) == "UTC"
+    pd.testing.assert_frame_equal(loaded, df.tz_convert("UTC"))
+
+
+def _write_csv_and_snapshot(root, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(storage, "HAS_PYARROW", False)
+        save_ohlcv(_make_ohlcv(), *ARGS, root)
+    path = get_ohlcv_path(*ARGS, root, ext="csv")
+    load_ohlcv(*ARGS, root)
+    assert os.path.exists(path + ".feather")
+    return path
+
+
+def test_snapshot_invalidated_by_mtime_change(tmp_path, monkeypatch):
+    path = _write_csv_and_snapshot(str(tmp_path), monkeypatch)
+    st = os.stat(path)
+
+    # Same size, new content and mtime
+    with open(path) as f:
+        text = f.read()
+    with open(path, "w") as f:
+        f.write(text.replace(",5.0", ",6.0"))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert os.stat(path).st_size == st.st_size
+
+    assert (_reload(str(tmp_path))["volume"] == 6.0).all()
+
+
+def test_snapshot_invalidated_by_size_change(tmp_path, monkeypatch):
+    path = _write_csv_and_snapshot(str(tmp_path), monkeypatch)
+    st = os.stat(path)
+
+    # New size, but the original mtime restored (as cp -p or rsync -a would)
+    with open(path) as f:
+        text = f.read()
+    with open(path, "w") as f:
+        f.write(text.replace(",5.0", ",50.0"))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert (_reload(str(tmp_path))["volume"] == 50.0).all()
+
+
+def test_parquet_save_removes_legacy_csv_and_snapshot(tmp_path, monkeypatch):
+    path = _write_csv_and_snapshot(str(tmp_path), monkeypatch)
+
+    df = _make_ohlcv(volume=7.0)
+    save_ohlcv(df, *ARGS, str(tmp_path))
+
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".feather")
+    pd.testing.assert_frame_equal(_reload(str(tmp_path)), df)
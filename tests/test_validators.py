@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_layer.validators import (
+    candle_integrity_validator,
+    timeframe_sanity_validator,
+    timestamp_validator,
+    validate_ohlcv,
+)
+
+
+def _make_ohlcv(n=60, freq="4h"):
+    close = 100 + np.arange(n, dtype=np.float64)
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": np.ones(n),
+        },
+        index=pd.date_range("2024-01-01", periods=n, freq=freq, tz="UTC"),
+    )
+
+
+def test_valid_frame_passes_unchanged():
+    df = _make_ohlcv()
+    assert validate_ohlcv(df, "4h") is df
+
+
+def test_naive_index_is_localized_to_utc():
+    df = _make_ohlcv().tz_localize(None)
+    assert str(timestamp_validator(df).index.tz) == "UTC"
+
+
+def test_duplicate_timestamps_rejected():
+    df = _make_ohlcv().iloc[[0, 1, 1, 2]]
+    with pytest.raises(RuntimeError, match="DUPLICATE ERROR"):
+        timestamp_validator(df)
+
+
+def test_out_of_order_rows_rejected():
+    df = _make_ohlcv().iloc[[0, 2, 1, 3]]
+    with pytest.raises(RuntimeError, match="CHRONOLOGY ERROR"):
+        timestamp_validator(df)
+
+
+def test_nat_timestamp_rejected():
+    df = _make_ohlcv(5)
+    index = df.index.tolist()
+    index[2] = pd.NaT
+    df.index = pd.DatetimeIndex(index)
+    with pytest.raises(RuntimeError, match="CHRONOLOGY ERROR"):
+        timestamp_validator(df)
+
+
+def test_high_below_low_rejected():
+    df = _make_ohlcv()
+    df.iloc[10, df.columns.get_loc("high")] = df["low"].iloc[10] - 0.5
+    with pytest.raises(RuntimeError, match="INTEGRITY ERROR: 1 candles") as exc:
+        candle_integrity_validator(df)
+    assert str(df.index[10]) in str(exc.value)
+
+
+@pytest.mark.parametrize("unit", ["s", "ms", "us", "ns"])
+def test_timeframe_sanity_is_unit_independent(unit):
+    df = _make_ohlcv(60, "4h")
+    df.index = df.index.as_unit(unit)
+    timeframe_sanity_validator(df, "4h")
+    with pytest.raises(RuntimeError, match="TIMEFRAME ERROR"):
+        timeframe_sanity_validator(df, "1d")
+
+
+def test_unsupported_timeframe_rejected():
+    with pytest.raises(RuntimeError, match="INPUT ERROR"):
+        timeframe_sanity_validator(_make_ohlcv(), "15m")